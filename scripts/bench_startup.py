@@ -0,0 +1,99 @@
+"""Startup-time benchmark for the CLI.
+
+Times `python -m src.rag_test_generator --help` and `--demo --dry-run`
+in fresh interpreters and reports the import cost of the slowest modules,
+so regressions in eager imports show up as numbers.
+
+    python scripts/bench_startup.py --repeat 5
+    python scripts/bench_startup.py --record bench/startup.jsonl   # append results for tracking
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "help": ["-m", "src.rag_test_generator", "--help"],
+    "dry_run": ["-m", "src.rag_test_generator", "--demo", "--dry-run", "--no-persist", "--no-embed-cache"],
+}
+
+
+def time_command(args: List[str], repeat: int) -> List[float]:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run([sys.executable, *args], cwd=ROOT,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        timings.append(time.perf_counter() - started)
+        if proc.returncode:
+            last = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+            raise RuntimeError(f"exit {proc.returncode}: {last[0]}")
+    return timings
+
+
+def slowest_imports(args: List[str], top: int) -> List[Tuple[str, float]]:
+    """Cumulative import time per top-level package, from `python -X importtime`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    packages: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        if name.startswith("  "):
+            continue  # nested import, already counted in its parent
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(cumulative)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [(name, us / 1e6) for name, us in ranked]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Measure CLI startup time")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    ap.add_argument("--scenario", choices=sorted(SCENARIOS), action="append", default=None)
+    ap.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    ap.add_argument("--record", type=str, default=None, help="Append the results as one JSON line to this file")
+    args = ap.parse_args()
+
+    results = {}
+    for name in args.scenario or sorted(SCENARIOS):
+        try:
+            timings = time_command(SCENARIOS[name], args.repeat)
+        except RuntimeError as e:
+            # e.g. the embedding model cannot be downloaded; still report the other scenarios
+            results[name] = {"error": str(e)}
+            print(f"{name}: failed ({e})")
+            continue
+        imports = slowest_imports(SCENARIOS[name], args.top)
+        results[name] = {
+            "median_s": round(statistics.median(timings), 3),
+            "min_s": round(min(timings), 3),
+            "imports_s": {module: round(seconds, 3) for module, seconds in imports},
+        }
+        print(f"{name}: median {results[name]['median_s']:.3f}s, min {results[name]['min_s']:.3f}s "
+              f"over {args.repeat} runs")
+        for module, seconds in imports:
+            print(f"    {seconds:7.3f}s  {module}")
+
+    if args.record:
+        record = {"timestamp": datetime.now(timezone.utc).isoformat(), "python": sys.version.split()[0],
+                  "provider": os.getenv("MODEL_PROVIDER", "groq"), "results": results}
+        path = Path(args.record)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(record) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""Batch generation over many Jira/Figma selections in one warm process.
+
+Manifest (JSON):
+
+    {
+      "defaults": {"map_reduce": true},
+      "jobs": [
+        {"name": "epic-101", "jira_jql": "\"Epic Link\" = ABC-101", "figma_files": ["KEY1"],
+         "output": "out/epic-101"},
+        {"name": "payments", "jira_project": "PAY", "output": "out/payments"}
+      ]
+    }
+
+Job fields: name, output, jira_jql, jira_project, figma_files (list or
+comma-separated), figma_ids, figma_depth, query, map_reduce, one_shot,
+workers, index_name. `defaults` applies to every job that does not set a field.
+
+The embedding model, LLM client, LLM response cache and Jira/Figma
+sessions are created once and shared by all jobs. LLM calls from all jobs
+share the LLM client's per-provider limits (PROVIDER_LIMITS). Finished jobs are
+recorded in a checkpoint file, so a rerun after a crash skips them.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+from src.config import (
+    BATCH_MAX_JOBS,
+    INDEX_DIR,
+    EMBED_CACHE_DIR,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES,
+)
+from src.clients.figma_client import FigmaClient
+from src.clients.http import connection_stats
+from src.clients.jira_client import JiraClient
+from src.rag.llm_cache import LLMResponseCache
+from src.rag.pipeline import RAGTestGenerator, make_embeddings
+from src.rag.providers import make_llm
+from src.rag_test_generator import (
+    build_docs, default_index_name, make_figma_client, make_jira_client, write_outputs,
+)
+
+JOB_FIELDS = {"name", "output", "jira_jql", "jira_project", "figma_files", "figma_ids", "figma_depth",
+              "query", "map_reduce", "one_shot", "workers", "index_name"}
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Read a manifest and return its jobs with defaults applied and names checked."""
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if isinstance(data, list):
+        data = {"jobs": data}
+    defaults = data.get("defaults", {})
+    jobs, names = [], set()
+    for i, raw in enumerate(data.get("jobs", [])):
+        job = {**defaults, **raw}
+        unknown = set(job) - JOB_FIELDS
+        if unknown:
+            raise ValueError(f"Job {i}: unknown fields {sorted(unknown)}")
+        if isinstance(job.get("figma_files"), str):
+            job["figma_files"] = [k.strip() for k in job["figma_files"].split(",") if k.strip()]
+        if isinstance(job.get("figma_ids"), str):
+            job["figma_ids"] = [k.strip() for k in job["figma_ids"].split(",") if k.strip()]
+        if not (job.get("jira_jql") or job.get("jira_project") or job.get("figma_files")):
+            raise ValueError(f"Job {i}: needs jira_jql, jira_project or figma_files")
+        job.setdefault("name", job.get("output") or f"job-{i}")
+        job.setdefault("output", str(Path("out") / job["name"]))
+        if job["name"] in names:
+            raise ValueError(f"Duplicate job name '{job['name']}'")
+        names.add(job["name"])
+        job.setdefault("index_name", default_index_name(job.get("jira_jql"), job.get("jira_project"),
+                                                        job.get("figma_files")))
+        jobs.append(job)
+    return jobs
+
+
+def job_fingerprint(job: Dict[str, Any]) -> str:
+    """Changes whenever the job definition does, so an edited job is not skipped as done."""
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+class Checkpoint:
+    """Per-job status persisted after every finished job (atomic replace, thread-safe)."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.jobs: Dict[str, dict] = {}
+        if self.path.exists():
+            self.jobs = json.loads(self.path.read_text(encoding="utf-8")).get("jobs", {})
+
+    def is_done(self, job: Dict[str, Any]) -> bool:
+        entry = self.jobs.get(job["name"])
+        return bool(entry and entry.get("status") == "done" and entry.get("fingerprint") == job_fingerprint(job))
+
+    def record(self, job: Dict[str, Any], status: str, **details):
+        with self._lock:
+            self.jobs[job["name"]] = {
+                "status": status,
+                "fingerprint": job_fingerprint(job),
+                "output": job["output"],
+                "finished": datetime.now(timezone.utc).isoformat(),
+                **details,
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps({"jobs": self.jobs}, indent=2), encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+@dataclass
+class SharedResources:
+    """Everything that is expensive to create and safe to share between job threads."""
+    embeddings: Any
+    llm: Any
+    llm_cache: Optional[LLMResponseCache] = None
+    jira_client: Optional[JiraClient] = None
+    figma_client: Optional[FigmaClient] = None
+    index_dir: str = INDEX_DIR
+    chunk_tokens: int = CHUNK_MAX_TOKENS
+    chunk_overlap: int = CHUNK_OVERLAP_TOKENS
+
+
+def make_shared(jobs: List[Dict[str, Any]], index_dir: str = INDEX_DIR,
+                embed_cache_dir: Optional[str] = EMBED_CACHE_DIR,
+                llm_cache_path: Optional[str] = LLM_CACHE_PATH) -> SharedResources:
+    llm_cache = None
+    if llm_cache_path:
+        llm_cache = LLMResponseCache(llm_cache_path, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                                     max_entries=LLM_CACHE_MAX_ENTRIES)
+    uses_jira = any(job.get("jira_jql") or job.get("jira_project") for job in jobs)
+    uses_figma = any(job.get("figma_files") for job in jobs)
+    return SharedResources(
+        embeddings=make_embeddings(embed_cache_dir),
+        llm=make_llm(),
+        llm_cache=llm_cache,
+        jira_client=make_jira_client() if uses_jira else None,
+        figma_client=make_figma_client() if uses_figma else None,
+        index_dir=index_dir,
+    )
+
+
+def run_job(job: Dict[str, Any], shared: SharedResources) -> Dict[str, Any]:
+    docs = build_docs(job.get("jira_jql"), job.get("jira_project"), job.get("figma_files"),
+                      figma_ids=job.get("figma_ids"), figma_depth=job.get("figma_depth"),
+                      jira_client=shared.jira_client, figma_client=shared.figma_client)
+    if not docs:
+        raise ValueError("No documents found from Jira/Figma")
+    rag = RAGTestGenerator(docs, index_name=job["index_name"], index_dir=shared.index_dir,
+                           chunk_tokens=shared.chunk_tokens, chunk_overlap=shared.chunk_overlap,
+                           embeddings=shared.embeddings, llm=shared.llm,
+                           llm_cache_path=None, llm_cache=shared.llm_cache)
+    if job.get("map_reduce"):
+        bundle = rag.generate_map_reduce(job.get("query"), max_workers=job.get("workers", 4))
+    elif job.get("one_shot"):
+        bundle = rag.generate_one_shot(job.get("query"))
+    else:
+        bundle = rag.generate_all(job.get("query"))
+    write_outputs(bundle, Path(job["output"]))
+    return {"documents": len(docs), "cases": len(bundle.cases)}
+
+
+def run_batch(jobs: List[Dict[str, Any]], shared: SharedResources, checkpoint: Checkpoint,
+              max_jobs: int = BATCH_MAX_JOBS) -> Dict[str, int]:
+    """Run every job not yet done in `checkpoint` on a pool of `max_jobs` threads."""
+    pending = [job for job in jobs if not checkpoint.is_done(job)]
+    index_names = [job["index_name"] for job in pending]
+    clashes = sorted({name for name in index_names if index_names.count(name) > 1})
+    if clashes:
+        # Two jobs writing one persistent index at the same time would corrupt it
+        raise ValueError(f"Jobs share index names {clashes}; set distinct index_name values")
+    counts = {"done": 0, "failed": 0, "skipped": len(jobs) - len(pending)}
+    print(f"Batch: {len(pending)} jobs to run, {counts['skipped']} already done")
+
+    def timed(job):
+        started = time.perf_counter()
+        return run_job(job, shared), time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, max_jobs)) as pool:
+        futures = {pool.submit(timed, job): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                details, seconds = future.result()
+            except Exception as e:
+                # One failed job should not sink the batch; it is retried on the next run
+                counts["failed"] += 1
+                checkpoint.record(job, "failed", error=str(e))
+                print(f"[{job['name']}] failed: {e}")
+                continue
+            counts["done"] += 1
+            checkpoint.record(job, "done", seconds=round(seconds, 1), **details)
+            print(f"[{job['name']}] {details['cases']} cases -> {job['output']} ({seconds:.1f}s)")
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RAG Test Generator - batch mode")
+    ap.add_argument("manifest", type=str, help="JSON manifest of jobs")
+    ap.add_argument("--jobs", type=int, default=BATCH_MAX_JOBS, help="Jobs running at the same time")
+    ap.add_argument("--checkpoint", type=str, default=None,
+                    help="Checkpoint file (default: <manifest>.checkpoint.json)")
+    ap.add_argument("--restart", action="store_true", help="Ignore the checkpoint and run every job")
+    ap.add_argument("--index-dir", type=str, default=INDEX_DIR, help="Directory of the persistent vector indexes")
+    ap.add_argument("--embed-cache-dir", type=str, default=EMBED_CACHE_DIR, help="Shared embedding cache directory")
+    ap.add_argument("--no-embed-cache", action="store_true", help="Always recompute embeddings")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    args = ap.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    checkpoint_path = args.checkpoint or str(Path(args.manifest).with_suffix(".checkpoint.json"))
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    shared = make_shared(jobs, index_dir=args.index_dir,
+                         embed_cache_dir=None if args.no_embed_cache else args.embed_cache_dir,
+                         llm_cache_path=None if args.no_cache else LLM_CACHE_PATH)
+    counts = run_batch(jobs, shared, checkpoint, max_jobs=args.jobs)
+    print(f"Batch finished: {counts['done']} done, {counts['failed']} failed, {counts['skipped']} skipped")
+    http = connection_stats()
+    if http["requests"]:
+        print(f"HTTP: {http['requests']} requests on {http['connections']} connections ({http['reuse_rate']:.0%} reused)")
+    if counts["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
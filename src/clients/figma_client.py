@@ -1,48 +1,130 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
+import ijson
 import requests
 from langchain_core.documents import Document
 
+from src.clients.http import send_with_retry, shared_session
+from src.utils.rate_limit import HostRateLimiter
+
+FIGMA_API = "https://api.figma.com/v1"
+
+
 class FigmaClient:
-    def __init__(self, token: str):
+    def __init__(self, token: str, max_workers: int = 8, rate_per_sec: float = 5.0, burst: float = 10.0,
+                 session: Optional[requests.Session] = None):
         if not token:
             raise ValueError("FigmaClient requires FIGMA_TOKEN")
         self.headers = {
             "X-Figma-Token": token,
         }
+        self.max_workers = max_workers
+        self.limiter = HostRateLimiter(rate_per_sec, burst)
+        self.session = session or shared_session()
 
-    def fetch_file_documents(self, file_key: str) -> List[Document]:
+    def fetch_file_documents(self, file_key: str, ids: Optional[List[str]] = None,
+                             depth: Optional[int] = None) -> List[Document]:
         """Pulls Figma file JSON and extracts text nodes and comments."""
-        file_url = f"https://api.figma.com/v1/files/{file_key}"
-        resp = requests.get(file_url, headers=self.headers, timeout=30)
-        resp.raise_for_status()
-        file_json = resp.json()
-
-        texts: List[str] = []
-        name = file_json.get("name", "Unknown File")
-        document = file_json.get("document", {})
-        self._collect_text(document, texts)
-
-        comments_url = f"https://api.figma.com/v1/files/{file_key}/comments"
-        crep = requests.get(comments_url, headers=self.headers, timeout=30)
-        comments = []
+        return self.fetch_many([file_key], ids=ids, depth=depth)
+
+    def fetch_many(self, file_keys: List[str], ids: Optional[List[str]] = None,
+                   depth: Optional[int] = None) -> List[Document]:
+        """One Document per file; files and their comments are fetched concurrently.
+
+        All requests share one pooled session and a per-host rate limit, with
+        at most `max_workers` in flight. Results keep the order of `file_keys`.
+        """
+        file_keys = list(dict.fromkeys(file_keys))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            texts = [pool.submit(self._fetch_text, key, ids, depth) for key in file_keys]
+            comments = [pool.submit(self._fetch_comments, key) for key in file_keys]
+            docs = []
+            for key, text_future, comment_future in zip(file_keys, texts, comments):
+                name, lines = text_future.result()
+                docs.append(self._file_document(key, name, lines, comment_future.result()))
+        return docs
+
+    def _fetch_text(self, file_key: str, ids: Optional[List[str]], depth: Optional[int]) -> Tuple[str, List[str]]:
+        """Streams the file JSON, so memory stays bounded by the extracted text
+        rather than the size of the design file. `ids` and `depth` restrict
+        the fetch to selected nodes / tree depth."""
+        params = {}
+        if ids:
+            params["ids"] = ",".join(ids)
+        if depth:
+            params["depth"] = depth
+        file_url = f"{FIGMA_API}/files/{file_key}"
+        resp = send_with_retry(self.session, "GET", file_url, headers=self.headers, params=params,
+                               timeout=30, stream=True, limiter=self.limiter)
+        with resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            name, texts = "Unknown File", []
+            for kind, value in iter_text(ijson.basic_parse(resp.raw, buf_size=64 * 1024)):
+                if kind == "name":
+                    name = value
+                else:
+                    texts.append(value)
+        return name, texts
+
+    def _fetch_comments(self, file_key: str) -> List[str]:
+        comments_url = f"{FIGMA_API}/files/{file_key}/comments"
         try:
+            crep = send_with_retry(self.session, "GET", comments_url, headers=self.headers,
+                                   timeout=30, limiter=self.limiter)
             crep.raise_for_status()
-            comments = [c.get("message", "") for c in crep.json().get("comments", [])]
+            return [c.get("message", "") for c in crep.json().get("comments", [])]
         except Exception:
-            comments = []
+            return []
 
+    def _file_document(self, file_key: str, name: str, texts: List[str], comments: List[str]) -> Document:
         body = f"Figma: {name}\n\nExtracted Text:\n" + "\n".join(texts)
         if comments:
             body += "\n\nComments:\n" + "\n".join(comments)
+        return Document(page_content=body, metadata={"source": "figma", "figma_file": name, "figma_key": file_key})
+
+
+def iter_text(events: Iterable[Tuple[str, object]]) -> Iterator[Tuple[str, str]]:
+    """Walk ijson basic_parse events of a Figma file with an explicit stack.
 
-        return [Document(page_content=body, metadata={"source": "figma", "figma_file": name})]
-
-    def _collect_text(self, node: dict, texts: List[str]):
-        if not isinstance(node, dict):
-            return
-        if node.get("type") == "TEXT":
-            chars = node.get("characters")
-            if chars:
-                texts.append(chars)
-        for child in node.get("children", []) or []:
-            self._collect_text(child, texts)
+    Yields ("name", file name) once, then ("text", line) for TEXT node content
+    and for the page / top-level frame headings that let the chunker split
+    along the design's structure. Only maps that are tree nodes (the
+    `document` value or items of a node's `children`) are inspected, so
+    unrelated keys such as a fill's `type` are ignored.
+    """
+    # Each entry is a map frame {"node", "key", "type", "name", "chars", "parent"}
+    # or an array frame {"array": True, "children": bool, "owner": owning node type}.
+    stack: List[dict] = []
+    for event, value in events:
+        top = stack[-1] if stack else None
+        if event == "start_map":
+            is_node = False
+            parent_type = ""
+            if top is not None and top.get("array"):
+                is_node = top["children"]
+                parent_type = top["owner"]
+            elif top is not None and len(stack) == 1 and top["key"] == "document":
+                is_node = True
+            stack.append({"node": is_node, "key": None, "type": None, "name": None,
+                          "chars": None, "parent": parent_type})
+        elif event == "map_key":
+            top["key"] = value
+        elif event == "start_array":
+            owner = top if top is not None and not top.get("array") else None
+            children = bool(owner and owner["node"] and owner["key"] == "children")
+            if children:
+                if owner["type"] == "CANVAS":
+                    yield "text", f"## Page: {owner['name'] or ''}"
+                elif owner["type"] == "FRAME" and owner["parent"] == "CANVAS":
+                    yield "text", f"### Frame: {owner['name'] or ''}"
+            stack.append({"array": True, "children": children, "owner": owner["type"] if owner else ""})
+        elif event in ("end_array", "end_map"):
+            frame = stack.pop()
+            if event == "end_map" and frame["node"] and frame["type"] == "TEXT" and frame["chars"]:
+                yield "text", frame["chars"]
+        elif top is not None and not top.get("array"):
+            if len(stack) == 1 and top["key"] == "name":
+                yield "name", value
+            elif top["node"] and top["key"] in ("type", "name", "characters"):
+                top["chars" if top["key"] == "characters" else top["key"]] = value
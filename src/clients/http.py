@@ -0,0 +1,180 @@
+"""Shared HTTP helpers: pooled keep-alive sessions and 429-aware retries."""
+import asyncio
+import importlib.util
+import threading
+import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Callable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.config import HTTP_MAX_CONNECTIONS, HTTP_MAX_PER_HOST, HTTP_KEEPALIVE_SECONDS, HTTP2
+from src.utils.rate_limit import HostRateLimiter
+
+if TYPE_CHECKING:
+    import httpx
+
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+
+def make_session(pool_size: int = 10, headers: Optional[dict] = None, block: bool = False) -> requests.Session:
+    """requests.Session with a keep-alive connection pool of `pool_size` per host; with `block`,
+    callers wait for a free connection instead of opening extra unpooled ones."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, pool_block=block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+class ConnectionStats:
+    """Requests sent and connections opened by the shared httpx clients."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.http2 = 0
+        self._lock = threading.Lock()
+
+    def count(self, requests: int = 0, connections: int = 0, http2: int = 0):
+        with self._lock:
+            self.requests += requests
+            self.connections += connections
+            self.http2 += http2
+
+
+_httpx_stats = ConnectionStats()
+_shared_session: Optional[requests.Session] = None
+_http_client: Optional["httpx.Client"] = None
+_async_http_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def shared_session() -> requests.Session:
+    """The process-wide requests.Session (Jira, Figma): keep-alive pools that block for a free
+    connection instead of opening more than HTTP_MAX_PER_HOST per host."""
+    global _shared_session
+    with _lock:
+        if _shared_session is None:
+            _shared_session = make_session(HTTP_MAX_PER_HOST, block=True)
+        return _shared_session
+
+
+def use_http2() -> bool:
+    if HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return HTTP2 == "1"
+
+
+def _httpx_options(sync: bool) -> dict:
+    import httpx
+
+    def on_response(response):
+        _httpx_stats.count(requests=1, http2=response.http_version == "HTTP/2")
+
+    async def aon_response(response):
+        on_response(response)
+
+    def trace(event: str, info: dict):
+        if event == "connection.connect_tcp.complete":
+            _httpx_stats.count(connections=1)
+
+    async def atrace(event: str, info: dict):
+        trace(event, info)
+
+    def on_request(request):
+        request.extensions["trace"] = trace if sync else atrace
+
+    async def aon_request(request):
+        on_request(request)
+
+    return {
+        "http2": use_http2(),
+        "limits": httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                               keepalive_expiry=HTTP_KEEPALIVE_SECONDS),
+        "timeout": httpx.Timeout(60.0, connect=10.0),
+        "event_hooks": {"request": [on_request if sync else aon_request],
+                        "response": [on_response if sync else aon_response]},
+    }
+
+
+def http_client() -> "httpx.Client":
+    """The process-wide httpx.Client for LLM SDKs (Groq, OpenAI)."""
+    global _http_client
+    import httpx
+    with _lock:
+        if _http_client is None or _http_client.is_closed:
+            _http_client = httpx.Client(**_httpx_options(sync=True))
+        return _http_client
+
+
+def async_http_client() -> "httpx.AsyncClient":
+    """The shared httpx.AsyncClient of the running event loop (pooled connections cannot
+    move between loops, so each loop gets its own)."""
+    import httpx
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = _async_http_clients[loop] = httpx.AsyncClient(**_httpx_options(sync=False))
+        return client
+
+
+def connection_stats() -> dict:
+    """Requests and newly opened connections across the shared session and httpx clients;
+    every request beyond the connections it needed reused a kept-alive one."""
+    requests_sent, connections = _httpx_stats.requests, _httpx_stats.connections
+    if _shared_session is not None:
+        # The same adapter serves http:// and https://
+        for adapter in {id(a): a for a in _shared_session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    requests_sent += pool.num_requests
+                    connections += pool.num_connections
+    return {
+        "requests": requests_sent,
+        "connections": connections,
+        "reused": max(0, requests_sent - connections),
+        "reuse_rate": max(0, requests_sent - connections) / requests_sent if requests_sent else 0.0,
+        "http2_requests": _httpx_stats.http2,
+    }
+
+
+def retry_after_seconds(resp: requests.Response, default: float) -> float:
+    """Delay requested by a Retry-After header (seconds or HTTP date), else `default`."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+def send_with_retry(session: requests.Session, method: str, url: str, retries: int = 5,
+                    backoff: float = 1.0, on_retry: Optional[Callable[[float], None]] = None,
+                    limiter: Optional[HostRateLimiter] = None, **kwargs) -> requests.Response:
+    """Send a request, waiting out 429/5xx responses (honoring Retry-After) up to `retries` times."""
+    for attempt in range(retries + 1):
+        if limiter:
+            limiter.acquire(urlparse(url).netloc)
+        resp = session.request(method, url, **kwargs)
+        if resp.status_code not in RETRYABLE_STATUS or attempt == retries:
+            return resp
+        delay = retry_after_seconds(resp, backoff * (2 ** attempt))
+        if on_retry:
+            on_retry(delay)
+        resp.close()
+        time.sleep(delay)
+    return resp
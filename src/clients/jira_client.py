@@ -1,38 +1,126 @@
-from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
 import base64
+import time
 import requests
 from langchain_core.documents import Document
 
+from src.clients.http import send_with_retry, shared_session
+
+
+@dataclass
+class JiraIngestStats:
+    pages: int = 0
+    issues: int = 0
+    bytes: int = 0
+    retries: int = 0
+    retry_wait: float = 0.0
+    seconds: float = 0.0
+
+    @property
+    def issues_per_sec(self) -> float:
+        return self.issues / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"{self.issues} issues in {self.pages} pages, {self.bytes / 1024:.0f} KiB, "
+                f"{self.seconds:.1f}s ({self.issues_per_sec:.0f} issues/s, {self.retries} retries)")
+
+
 class JiraClient:
-    def __init__(self, base_url: str, email: str, api_token: str):
+    # Custom fields that commonly hold acceptance criteria
+    ACCEPTANCE_FIELDS = ["customfield_10073", "customfield_12345"]
+    # Only request what _issue_document reads; full issue payloads are many times larger
+    SEARCH_FIELDS = ["summary", "description", "updated"] + ACCEPTANCE_FIELDS
+
+    def __init__(self, base_url: str, email: str, api_token: str, page_size: int = 100,
+                 session: Optional[requests.Session] = None):
         if not base_url or not email or not api_token:
             raise ValueError("JiraClient requires base_url, email, and api_token")
         self.base_url = base_url.rstrip("/")
         self.email = email
         self.api_token = api_token
+        self.page_size = page_size
         token = base64.b64encode(f"{email}:{api_token}".encode()).decode()
         self.headers = {
             "Authorization": f"Basic {token}",
             "Accept": "application/json",
             "Content-Type": "application/json",
         }
+        self.session = session or shared_session()
+        self.stats = JiraIngestStats()
+
+    def search(self, jql: Optional[str] = None, project_key: Optional[str] = None, limit: Optional[int] = None) -> List[Document]:
+        return list(self.iter_documents(jql=jql, project_key=project_key, limit=limit))
+
+    def iter_documents(self, jql: Optional[str] = None, project_key: Optional[str] = None,
+                       limit: Optional[int] = None) -> Iterator[Document]:
+        """Yield one Document per issue, page by page, following nextPageToken to the end."""
+        for issue in self.iter_issues(jql=jql, project_key=project_key, limit=limit):
+            yield self._issue_document(issue)
 
-    def search(self, jql: Optional[str] = None, project_key: Optional[str] = None, limit: int = 50) -> List[Document]:
+    def iter_keys(self, jql: str) -> Iterator[str]:
+        """Keys of every issue matching `jql`, without fetching issue fields."""
+        for issue in self.iter_issues(jql=jql, fields=["key"], page_size=max(self.page_size, 1000)):
+            yield issue.get("key")
+
+    def iter_issues(self, jql: Optional[str] = None, project_key: Optional[str] = None,
+                    limit: Optional[int] = None, fields: Optional[List[str]] = None,
+                    page_size: Optional[int] = None) -> Iterator[dict]:
+        """Yield raw issues page by page.
+
+        /search/jql pages are cursor-based, so pages cannot be requested out of
+        order; instead the next page is fetched in the background while the
+        current one is being consumed.
+        """
         if not jql and not project_key:
             raise ValueError("Provide either JQL or project_key")
         if project_key and not jql:
             jql = f"project = {project_key} ORDER BY updated DESC"
-        
+
         # Use Jira API v3 search/jql endpoint
         url = f"{self.base_url}/rest/api/3/search/jql"
+        page_size = page_size or self.page_size
         params = {
-            "jql": jql, 
-            "maxResults": limit,
-            "fields": "summary,description,customfield_10073"
+            "jql": jql,
+            "maxResults": page_size if limit is None else min(page_size, limit),
+            "fields": ",".join(fields or self.SEARCH_FIELDS),
         }
-        
-        resp = requests.get(url, headers=self.headers, params=params, timeout=30)
-        
+
+        started = time.perf_counter()
+        emitted = 0
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(self._fetch_page, url, dict(params))
+            while pending is not None:
+                data = pending.result()
+                pending = None
+                token = data.get("nextPageToken")
+                issues = data.get("issues", [])
+                if token and not data.get("isLast", False) and issues and (limit is None or emitted + len(issues) < limit):
+                    pending = prefetcher.submit(self._fetch_page, url, {**params, "nextPageToken": token})
+                for issue in issues:
+                    if limit is not None and emitted >= limit:
+                        break
+                    emitted += 1
+                    self.stats.issues += 1
+                    self.stats.seconds += time.perf_counter() - started
+                    started = time.perf_counter()
+                    yield issue
+        self.stats.seconds += time.perf_counter() - started
+
+    def _fetch_page(self, url: str, params: dict) -> dict:
+        resp = send_with_retry(self.session, "GET", url, headers=self.headers, params=params,
+                               timeout=30, on_retry=self._record_retry)
+        self._check_response(resp)
+        self.stats.pages += 1
+        self.stats.bytes += len(resp.content)
+        return resp.json()
+
+    def _record_retry(self, delay: float):
+        self.stats.retries += 1
+        self.stats.retry_wait += delay
+
+    def _check_response(self, resp: requests.Response):
         # Better error messages
         if resp.status_code == 410:
             raise ValueError(f"Jira API returned 410 Gone. The API token may be expired or invalid. Response: {resp.text[:200]}")
@@ -42,23 +130,21 @@ class JiraClient:
             raise ValueError("Jira access forbidden. Check permissions.")
         if resp.status_code == 404:
             raise ValueError("Jira API endpoint not found. Check JIRA_BASE_URL.")
-        
         resp.raise_for_status()
-        data = resp.json()
-        docs: List[Document] = []
-        for issue in data.get("issues", []):
-            key = issue.get("key")
-            fields = issue.get("fields", {})
-            summary = fields.get("summary", "")
-            description = self._extract_description(fields)
-            acceptance = self._extract_acceptance_criteria(fields)
-            body = f"Jira {key}: {summary}\n\nDescription:\n{description}\n\nAcceptance Criteria:\n{acceptance}"
-            docs.append(Document(page_content=body, metadata={
-                "source": "jira",
-                "jira_key": key,
-                "summary": summary,
-            }))
-        return docs
+
+    def _issue_document(self, issue: dict) -> Document:
+        key = issue.get("key")
+        fields = issue.get("fields", {})
+        summary = fields.get("summary", "")
+        description = self._extract_description(fields)
+        acceptance = self._extract_acceptance_criteria(fields)
+        body = f"Jira {key}: {summary}\n\nDescription:\n{description}\n\nAcceptance Criteria:\n{acceptance}"
+        return Document(page_content=body, metadata={
+            "source": "jira",
+            "jira_key": key,
+            "summary": summary,
+            "updated": fields.get("updated"),
+        })
 
     def _extract_description(self, fields: dict) -> str:
         desc = fields.get("description")
@@ -69,7 +155,7 @@ class JiraClient:
 
     def _extract_acceptance_criteria(self, fields: dict) -> str:
         # Common custom field names
-        for key in ["Acceptance Criteria", "acceptanceCriteria", "customfield_12345"]:
+        for key in ["Acceptance Criteria", "acceptanceCriteria"] + self.ACCEPTANCE_FIELDS:
             val = fields.get(key)
             if val:
                 if isinstance(val, dict):
@@ -0,0 +1,142 @@
+"""Incremental Jira sync driven by a per-JQL `updated` watermark."""
+import hashlib
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from src.clients.jira_client import JiraClient
+
+_ORDER_BY = re.compile(r"\s+ORDER\s+BY\s+.*$", re.IGNORECASE | re.DOTALL)
+
+
+@dataclass
+class ChangeSet:
+    jql: str
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    documents: List[Document] = field(default_factory=list)  # added + changed issues
+    watermark: Optional[str] = None
+    watermark_before: Optional[str] = None
+    full: bool = False
+    _hashes: Dict[str, str] = field(default_factory=dict, repr=False)
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        kind = "full sync" if self.full else f"since {self.watermark_before}"
+        return f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed ({kind})"
+
+    def to_dict(self) -> dict:
+        return {
+            "jql": self.jql,
+            "since": self.watermark_before,
+            "watermark": self.watermark,
+            "added": self.added,
+            "changed": self.changed,
+            "removed": self.removed,
+        }
+
+
+class JiraSync:
+    """Fetches only issues updated since the last committed sync of a JQL query.
+
+    State per JQL (watermark and the content hash of every known issue) is
+    kept under `state_dir`. `fetch_changes` computes a ChangeSet without
+    touching the state; call `commit` once the change set has been consumed,
+    so a failed run is retried from the same watermark.
+    """
+
+    def __init__(self, client: JiraClient, state_dir: str, overlap_minutes: int = 5):
+        self.client = client
+        self.state_dir = Path(state_dir)
+        self.overlap_minutes = overlap_minutes
+
+    def fetch_changes(self, jql: Optional[str] = None, project_key: Optional[str] = None) -> ChangeSet:
+        if not jql and not project_key:
+            raise ValueError("Provide either JQL or project_key")
+        if project_key and not jql:
+            jql = f"project = {project_key} ORDER BY updated DESC"
+
+        state = self._read_state(jql)
+        known: Dict[str, str] = state.get("issues", {})
+        since = state.get("watermark")
+        changes = ChangeSet(jql=jql, watermark=since, watermark_before=since, full=not since)
+
+        if since:
+            # Relative JQL dates are immune to the user's Jira timezone setting
+            elapsed = datetime.now(timezone.utc) - datetime.fromisoformat(since)
+            minutes = max(math.ceil(elapsed.total_seconds() / 60), 0) + self.overlap_minutes
+            base = _ORDER_BY.sub("", jql).strip()
+            fetch_jql = f"({base}) AND updated >= -{minutes}m ORDER BY updated ASC"
+        else:
+            fetch_jql = jql
+
+        hashes = dict(known)
+        for doc in self.client.iter_documents(jql=fetch_jql):
+            key = doc.metadata["jira_key"]
+            digest = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+            changes.watermark = _max_timestamp(changes.watermark, doc.metadata.get("updated"))
+            if key not in known:
+                changes.added.append(key)
+            elif known[key] != digest:
+                changes.changed.append(key)
+            else:
+                continue
+            hashes[key] = digest
+            changes.documents.append(doc)
+
+        if since:
+            # Issues deleted or moved out of the query never show up as updated
+            current = set(self.client.iter_keys(jql))
+            changes.removed = sorted(k for k in known if k not in current)
+        else:
+            fetched = set(changes.added)
+            changes.removed = sorted(k for k in known if k not in fetched)
+        for key in changes.removed:
+            hashes.pop(key, None)
+        changes._hashes = hashes
+        return changes
+
+    def commit(self, changes: ChangeSet):
+        """Persist the watermark and issue hashes of a consumed change set."""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        path = self._state_path(changes.jql)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "jql": changes.jql,
+            "watermark": changes.watermark,
+            "issues": changes._hashes,
+        }, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def _state_path(self, jql: str) -> Path:
+        return self.state_dir / f"jira-{hashlib.sha1(jql.encode('utf-8')).hexdigest()[:12]}.json"
+
+    def _read_state(self, jql: str) -> dict:
+        path = self._state_path(jql)
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _max_timestamp(current: Optional[str], updated: Optional[str]) -> Optional[str]:
+    """Later of an ISO watermark and a Jira `updated` value, as a UTC ISO string."""
+    if not updated:
+        return current
+    try:
+        ts = datetime.strptime(updated, "%Y-%m-%dT%H:%M:%S.%f%z").astimezone(timezone.utc)
+    except ValueError:
+        return current
+    if current is None or ts > datetime.fromisoformat(current):
+        return ts.isoformat()
+    return current
@@ -28,8 +28,131 @@ ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet")
 JIRA_BASE_URL = "JIRA_BASE_URL_HERE"
 JIRA_EMAIL = "JIRA_EMAIL_HERE"
 JIRA_API_TOKEN = "YOUR_JIRA_API_TOKEN_HERE"
+JIRA_PAGE_SIZE = int(os.getenv("JIRA_PAGE_SIZE", "100"))
+# Incremental sync state (per-JQL watermark); overlap absorbs clock skew
+SYNC_STATE_DIR = os.getenv("RAG_STATE_DIR", ".rag_state")
+JIRA_SYNC_OVERLAP_MINUTES = int(os.getenv("JIRA_SYNC_OVERLAP_MINUTES", "5"))
+
+# Shared HTTP transport: Jira/Figma (requests) and the Groq/OpenAI SDKs (httpx) keep connections
+# alive in process-wide pools; requests waits for one of HTTP_MAX_PER_HOST connections per host,
+# httpx for one of HTTP_MAX_CONNECTIONS. HTTP/2 (httpx only) is used when RAG_HTTP2 is "1", or
+# "auto" and the h2 package is installed
+HTTP_MAX_CONNECTIONS = int(os.getenv("RAG_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_PER_HOST = int(os.getenv("RAG_HTTP_MAX_PER_HOST", "16"))
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("RAG_HTTP_KEEPALIVE_SECONDS", "60"))
+HTTP2 = os.getenv("RAG_HTTP2", "auto")
 
 # Figma
 FIGMA_TOKEN = "YOUR_FIGMA_TOKEN_HERE"
+FIGMA_MAX_WORKERS = int(os.getenv("FIGMA_MAX_WORKERS", "8"))
+FIGMA_RATE_PER_SEC = float(os.getenv("FIGMA_RATE_PER_SEC", "5"))
 
 DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Embedding engine: encode batch size, worker processes for bulk indexing (0/1 = in-process)
+# and intra-op threads (0 = torch default, or cores / processes for pool workers)
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+EMBED_PROCESSES = int(os.getenv("RAG_EMBED_PROCESSES", "0"))
+EMBED_THREADS = int(os.getenv("RAG_EMBED_THREADS", "0"))
+
+# Persistent vector index store (one sub-directory per index name)
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", ".rag_index")
+
+# ANN index kind: auto, flat, hnsw, ivf (IVF-Flat) or ivfpq. `auto` uses exact search up to
+# ANN_FLAT_MAX vectors, HNSW up to ANN_HNSW_MAX, IVF-Flat up to ANN_IVF_MAX and IVF-PQ beyond
+INDEX_KIND = os.getenv("RAG_INDEX_KIND", "auto")
+ANN_FLAT_MAX = int(os.getenv("RAG_ANN_FLAT_MAX", "20000"))
+ANN_HNSW_MAX = int(os.getenv("RAG_ANN_HNSW_MAX", "200000"))
+ANN_IVF_MAX = int(os.getenv("RAG_ANN_IVF_MAX", "1000000"))
+ANN_HNSW_M = int(os.getenv("RAG_ANN_HNSW_M", "32"))
+ANN_HNSW_EF_CONSTRUCTION = int(os.getenv("RAG_ANN_HNSW_EF_CONSTRUCTION", "200"))
+ANN_HNSW_EF_SEARCH = int(os.getenv("RAG_ANN_HNSW_EF_SEARCH", "64"))
+ANN_NPROBE = int(os.getenv("RAG_ANN_NPROBE", "16"))
+ANN_PQ_BYTES = int(os.getenv("RAG_ANN_PQ_BYTES", "48"))
+# IVF training uses at most this many vectors and is redone once the index outgrows it this many times
+ANN_TRAIN_SAMPLE = int(os.getenv("RAG_ANN_TRAIN_SAMPLE", "100000"))
+ANN_RETRAIN_GROWTH = float(os.getenv("RAG_ANN_RETRAIN_GROWTH", "4"))
+
+# Content-addressed embedding cache shared by every index and run
+EMBED_CACHE_DIR = os.getenv("RAG_EMBED_CACHE_DIR", ".rag_cache/embeddings")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("RAG_EMBED_CACHE_MAX_ENTRIES", "200000"))
+
+# Chunking stage between the Jira/Figma clients and the vector store (0 disables)
+TOKENIZER_ENCODING = os.getenv("RAG_TOKENIZER_ENCODING", "cl100k_base")
+CHUNK_MAX_TOKENS = int(os.getenv("RAG_CHUNK_MAX_TOKENS", "384"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("RAG_CHUNK_OVERLAP_TOKENS", "48"))
+
+# Persistent LLM response cache (keyed on provider, model, temperature, prompt and schema)
+LLM_CACHE_PATH = os.getenv("RAG_LLM_CACHE_PATH", ".rag_cache/llm_responses.sqlite")
+LLM_CACHE_TTL_SECONDS = float(os.getenv("RAG_LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("RAG_LLM_CACHE_MAX_ENTRIES", "5000"))
+
+# Retrieval: chunks per query and the semantic cache for near-identical queries
+RETRIEVAL_K = int(os.getenv("RAG_RETRIEVAL_K", "6"))
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RAG_RETRIEVAL_CACHE_SIZE", "256"))
+RETRIEVAL_CACHE_THRESHOLD = float(os.getenv("RAG_RETRIEVAL_CACHE_THRESHOLD", "0.97"))
+# Retrieval mode: dense (FAISS only) or hybrid (BM25 + FAISS fused with reciprocal rank fusion).
+# RERANK_MODEL (e.g. cross-encoder/ms-marco-MiniLM-L-6-v2) reranks the top RERANK_CANDIDATES locally
+RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+HYBRID_FETCH_K = int(os.getenv("RAG_HYBRID_FETCH_K", "30"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RERANK_MODEL = os.getenv("RAG_RERANK_MODEL", "")
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+
+# Generation length: max_tokens is sized per call from the prompt and clamped to
+# this range; truncated replies are continued up to LLM_MAX_CONTINUATIONS times
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("RAG_LLM_MIN_OUTPUT_TOKENS", "1024"))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("RAG_LLM_MAX_OUTPUT_TOKENS", "8192"))
+LLM_MAX_CONTINUATIONS = int(os.getenv("RAG_LLM_MAX_CONTINUATIONS", "3"))
+
+# One-shot generation: plan, scenarios and cases in a single call; parts the reply lacks or
+# gets wrong are generated separately
+GENERATION_ONE_SHOT = os.getenv("RAG_ONE_SHOT", "0") == "1"
+
+# Per-provider LLM limits shared by all jobs of a batch run: (max concurrent calls, calls per minute)
+PROVIDER_LIMITS = {
+    name: (int(os.getenv(f"{name.upper()}_MAX_CONCURRENCY", concurrency)),
+           float(os.getenv(f"{name.upper()}_RATE_PER_MIN", rate)))
+    for name, concurrency, rate in (("groq", "4", "30"), ("cohere", "4", "20"),
+                                    ("openai", "8", "500"), ("anthropic", "4", "50"))
+}
+# Tokens per minute per provider (prompt + max_tokens reserved per call, unused part returned; 0 = no limit)
+PROVIDER_TOKEN_LIMITS = {
+    name: float(os.getenv(f"{name.upper()}_TOKENS_PER_MIN", tpm))
+    for name, tpm in (("groq", "12000"), ("cohere", "0"), ("openai", "200000"), ("anthropic", "40000"))
+}
+# LLM client: 429/5xx/timeouts are retried LLM_RETRIES times with jittered exponential backoff (or
+# the provider's Retry-After, unless longer than LLM_BACKOFF_MAX), then the next provider of
+# LLM_FAILOVER that has an API key takes over. A provider failing LLM_BREAKER_FAILURES calls in a
+# row is skipped for LLM_BREAKER_RESET_SECONDS
+LLM_RETRIES = int(os.getenv("RAG_LLM_RETRIES", "4"))
+LLM_BACKOFF_BASE = float(os.getenv("RAG_LLM_BACKOFF_BASE", "1"))
+LLM_BACKOFF_MAX = float(os.getenv("RAG_LLM_BACKOFF_MAX", "30"))
+LLM_BREAKER_FAILURES = int(os.getenv("RAG_LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("RAG_LLM_BREAKER_RESET_SECONDS", "60"))
+LLM_FAILOVER = tuple(p.strip() for p in os.getenv("RAG_LLM_FAILOVER", "groq,cohere,openai,anthropic").split(",")
+                     if p.strip())
+BATCH_MAX_JOBS = int(os.getenv("RAG_BATCH_MAX_JOBS", "4"))
+
+# Provider prompt caching: the system directive and context form one prefix shared by the
+# plan/scenario/case calls of a run. Anthropic needs a cache_control breakpoint; OpenAI caches
+# long prefixes automatically. For these providers concurrent runs send one call first to warm it
+PROMPT_CACHE = os.getenv("RAG_PROMPT_CACHE", "1") != "0"
+PROMPT_CACHE_PROVIDERS = ("anthropic", "openai")
+
+# Context assembly: retrieved chunks are packed into at most this many tokens per provider,
+# never more than the model's context window leaves after the prompt and output allowance
+PROVIDER_CONTEXT = {
+    name: (int(os.getenv(f"{name.upper()}_CONTEXT_WINDOW", window)),
+           int(os.getenv(f"{name.upper()}_CONTEXT_BUDGET", budget)))
+    for name, window, budget in (("groq", "131072", "6000"), ("cohere", "128000", "6000"),
+                                 ("openai", "16385", "4000"), ("anthropic", "200000", "8000"))
+}
+CONTEXT_PROMPT_RESERVE = int(os.getenv("RAG_CONTEXT_PROMPT_RESERVE", "1500"))
+# Passages whose word shingles are this much covered by already-packed context are dropped
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("RAG_CONTEXT_DEDUP_THRESHOLD", "0.8"))
+
+# Long-running HTTP server (python -m src.server)
+SERVER_HOST = os.getenv("RAG_SERVER_HOST", "127.0.0.1")
+SERVER_PORT = int(os.getenv("RAG_SERVER_PORT", "8080"))
+SERVER_WORKERS = int(os.getenv("RAG_SERVER_WORKERS", "2"))
+SERVER_QUEUE_SIZE = int(os.getenv("RAG_SERVER_QUEUE_SIZE", "16"))
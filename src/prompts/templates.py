@@ -26,3 +26,25 @@ CASE_INSTRUCTIONS = (
     "- priority: High/Medium/Low\n"
     "Be precise and executable. Return a JSON array of test case objects."
 )
+
+REQUIREMENT_CASE_INSTRUCTIONS = (
+    CASE_INSTRUCTIONS + "\n"
+    "Cover ONLY requirement {requirement} (the first part of the context); the related context is for reference. "
+    "Include positive, negative and edge cases for it, and set traceability to [\"{requirement}\"] on every case."
+)
+
+CONTINUE_INSTRUCTIONS = (
+    "Your previous reply was cut off. Continue exactly where it stopped: output only the remaining JSON, "
+    "without repeating anything already written and without markdown or commentary."
+)
+
+BUNDLE_INSTRUCTIONS = (
+    "Produce the Test Plan, the Test Scenarios and the Test Cases in one reply, as a single JSON object "
+    "with exactly these top-level keys, in this order:\n"
+    "- testPlan: the TestPlan object (scope, objectives, strategy, in/out of scope, assumptions, risks, metrics)\n"
+    "- testScenarios: list of TestScenario objects (id, title, description) with an empty 'cases' field\n"
+    "- testCases: FLAT list of test case objects (testCaseId, title, objective, preconditions, steps, "
+    "expectedResults, priority High/Medium/Low, traceability)\n"
+    "Keep the three parts separate: do not nest cases inside scenarios or scenarios inside the plan. "
+    "Stick to the provided context; include positive, negative and edge cases."
+)
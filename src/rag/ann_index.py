@@ -0,0 +1,213 @@
+"""FAISS index factory: exact, HNSW, IVF-Flat and IVF-PQ indexes chosen by corpus size."""
+import math
+import statistics
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.config import (
+    ANN_FLAT_MAX, ANN_HNSW_MAX, ANN_IVF_MAX,
+    ANN_HNSW_M, ANN_HNSW_EF_CONSTRUCTION, ANN_HNSW_EF_SEARCH,
+    ANN_NPROBE, ANN_PQ_BYTES, ANN_TRAIN_SAMPLE, ANN_RETRAIN_GROWTH,
+)
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+INDEX_KINDS = ("flat", "hnsw", "ivf", "ivfpq")
+
+
+def choose_kind(n_vectors: int, requested: str = "auto") -> str:
+    """`requested` unless it is "auto", else the cheapest kind that keeps queries fast at this size."""
+    if requested != "auto":
+        if requested not in INDEX_KINDS:
+            raise ValueError(f"Unknown index kind '{requested}'; expected auto or one of {INDEX_KINDS}")
+        return requested
+    if n_vectors <= ANN_FLAT_MAX:
+        return "flat"
+    if n_vectors <= ANN_HNSW_MAX:
+        return "hnsw"
+    if n_vectors <= ANN_IVF_MAX:
+        return "ivf"
+    return "ivfpq"
+
+
+def index_params(kind: str, n_vectors: int, dim: int) -> dict:
+    """Build parameters for `kind`, scaled to the corpus (stored in the index manifest)."""
+    if kind == "hnsw":
+        return {"m": ANN_HNSW_M, "ef_construction": ANN_HNSW_EF_CONSTRUCTION}
+    if kind not in ("ivf", "ivfpq"):
+        return {}
+    # ~4 * sqrt(N) lists, with enough training points per centroid for k-means
+    train = min(n_vectors, ANN_TRAIN_SAMPLE)
+    params = {"nlist": max(1, min(int(4 * math.sqrt(n_vectors)), train // 39)), "trained_on": n_vectors}
+    if kind == "ivfpq":
+        # Code size must divide the dimension; fewer bits per code when there is too little to train on
+        params["m"] = max(d for d in range(1, min(dim, ANN_PQ_BYTES) + 1) if dim % d == 0)
+        params["nbits"] = max(1, min(8, int(math.log2(max(2, train)))))
+    return params
+
+
+def new_index(kind: str, dim: int, params: dict):
+    """An empty (untrained) index."""
+    import faiss
+    if kind == "flat":
+        return faiss.IndexFlatL2(dim)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+    if kind == "ivf":
+        return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, params["nlist"])
+    if kind == "ivfpq":
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, params["nlist"], params["m"], params["nbits"])
+    raise ValueError(f"Unknown index kind '{kind}'")
+
+
+def configure_search(index):
+    """Apply the query-time knobs from config (not all of them survive a save/load)."""
+    import faiss
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ANN_HNSW_EF_SEARCH
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(ANN_NPROBE, ivf.nlist)
+    return index
+
+
+def build_index(kind: str, vectors: np.ndarray, params: Optional[dict] = None, empty=None):
+    """Train (if needed) and fill an index of `kind` with `vectors`.
+
+    `empty` is an already-trained, empty index to reuse instead of training
+    again, e.g. when rebuilding after deletes.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = empty
+    if index is None:
+        index = new_index(kind, vectors.shape[1], params or index_params(kind, len(vectors), vectors.shape[1]))
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > ANN_TRAIN_SAMPLE:
+                rows = np.random.default_rng(0).choice(len(vectors), ANN_TRAIN_SAMPLE, replace=False)
+                sample = vectors[np.sort(rows)]
+            index.train(sample)
+    index.add(vectors)
+    return configure_search(index)
+
+
+def empty_like(index):
+    """A copy of `index` with its training (centroids, codebooks) but no vectors."""
+    import faiss
+    clone = faiss.clone_index(index)
+    clone.reset()
+    return configure_search(clone)
+
+
+def needs_retrain(kind: str, params: dict, n_vectors: int) -> bool:
+    """IVF centroids trained on a much smaller corpus leave the lists badly balanced."""
+    return kind in ("ivf", "ivfpq") and n_vectors > ANN_RETRAIN_GROWTH * max(1, params.get("trained_on", 0))
+
+
+def is_lossy(index) -> bool:
+    """True when the index does not keep the original vectors (product quantization)."""
+    import faiss
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and not isinstance(faiss.downcast_index(ivf), faiss.IndexIVFFlat)
+
+
+def stored_vectors(vs: "FAISS", embeddings: Embeddings, positions: Optional[List[int]] = None) -> np.ndarray:
+    """The full-precision vectors at `positions` of `vs` (default: all, in position order).
+
+    Read back from the index when it stores them, otherwise re-embedded from
+    the docstore (served by the embedding cache when one is in front).
+    """
+    import faiss
+    positions = sorted(vs.index_to_docstore_id) if positions is None else positions
+    if not is_lossy(vs.index):
+        ivf = faiss.try_extract_index_ivf(vs.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        return np.vstack([vs.index.reconstruct(p) for p in positions]) if positions else np.empty((0, vs.index.d))
+    texts = [vs.docstore.search(vs.index_to_docstore_id[p]).page_content for p in positions]
+    return np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+
+
+def make_vectorstore(embeddings: Embeddings, index, docs: List[Document], ids: List[str]) -> "FAISS":
+    """LangChain FAISS wrapper over `index`, which must already hold the vectors of `docs` in order."""
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    if index.ntotal != len(docs):
+        raise ValueError(f"Index holds {index.ntotal} vectors for {len(docs)} documents")
+    docstore = InMemoryDocstore({
+        id_: Document(id=id_, page_content=d.page_content, metadata=d.metadata) for id_, d in zip(ids, docs)
+    })
+    return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+
+def build_vectorstore(docs: List[Document], embeddings: Embeddings, kind: str = "auto",
+                      ids: Optional[List[str]] = None) -> "FAISS":
+    """FAISS.from_documents with the index kind chosen (or forced) by `kind`."""
+    if not docs:
+        raise ValueError("Cannot build an index from zero documents.")
+    ids = ids or [str(i) for i in range(len(docs))]
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in docs]), dtype=np.float32)
+    index = build_index(choose_kind(len(docs), kind), vectors)
+    return make_vectorstore(embeddings, index, docs, ids)
+
+
+def index_kind(index) -> str:
+    import faiss
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivfpq" if is_lossy(index) else "ivf"
+    return "flat"
+
+
+def index_bytes(index) -> int:
+    import faiss
+    return len(faiss.serialize_index(index))
+
+
+def _percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    ms = sorted(s * 1000 for s in samples)
+    return {"p50_ms": statistics.median(ms), "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))]}
+
+
+def compare_to_exact(index, vectors: np.ndarray, k: int = 10, n_queries: int = 200, seed: int = 0) -> dict:
+    """Recall@k and per-query latency of `index` against exact search over the same `vectors`.
+
+    Queries are a random sample of the indexed vectors themselves.
+    """
+    import faiss
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    rows = np.random.default_rng(seed).choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    queries = vectors[rows]
+    k = min(k, len(vectors))
+    found, ann_times, exact_times = 0, [], []
+    for q in queries:
+        q = q.reshape(1, -1)
+        started = time.perf_counter()
+        _, truth = exact.search(q, k)
+        exact_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        _, got = index.search(q, k)
+        ann_times.append(time.perf_counter() - started)
+        found += len(set(truth[0]) & set(got[0]))
+    return {
+        "kind": index_kind(index),
+        "vectors": int(index.ntotal),
+        "k": k,
+        "queries": len(queries),
+        "recall": found / (len(queries) * k) if len(queries) else 0.0,
+        "ann": _percentiles(ann_times or [0.0]),
+        "exact": _percentiles(exact_times or [0.0]),
+        "index_bytes": index_bytes(index),
+        "exact_bytes": index_bytes(exact),
+    }
@@ -0,0 +1,138 @@
+"""Token-aware, structure-aware chunking of Jira and Figma documents."""
+import re
+from typing import Dict, List, Pattern, Tuple
+
+from langchain_core.documents import Document
+
+from src.utils.tokens import count_tokens, split_by_tokens
+
+# (level, pattern) pairs marking section starts; a level-2 section nests in the
+# nearest preceding level-1 section, whose marker line is repeated as context.
+SECTION_MARKERS: Dict[str, List[Tuple[int, Pattern]]] = {
+    "jira": [
+        (1, re.compile(r"^(Description|Acceptance Criteria):\s*$")),
+    ],
+    "figma": [
+        (1, re.compile(r"^Extracted Text:\s*$")),
+        (1, re.compile(r"^## Page: ")),
+        (2, re.compile(r"^### Frame: ")),
+        (1, re.compile(r"^Comments:\s*$")),
+    ],
+}
+
+
+class DocumentChunker:
+    """Splits documents into chunks of at most `max_tokens` tokens.
+
+    Jira issues are split on their Description / Acceptance Criteria sections
+    and Figma files on pages and top-level frames. Every chunk repeats the
+    document title line (and the enclosing page for frames) so it still reads
+    on its own, and keeps the source metadata plus `chunk_index`/`section`.
+    """
+
+    def __init__(self, max_tokens: int = 384, overlap_tokens: int = 48):
+        if overlap_tokens >= max_tokens:
+            raise ValueError("overlap_tokens must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def split(self, docs: List[Document]) -> List[Document]:
+        chunks: List[Document] = []
+        for doc in docs:
+            chunks.extend(self.split_document(doc))
+        return chunks
+
+    def split_document(self, doc: Document) -> List[Document]:
+        if count_tokens(doc.page_content) <= self.max_tokens:
+            return [Document(page_content=doc.page_content,
+                             metadata={**doc.metadata, "chunk_index": 0, "chunk_count": 1, "section": ""})]
+
+        title, sections = self._sections(doc)
+        pieces: List[Tuple[Tuple[str, ...], str, str]] = []  # (context lines, section name, text)
+        for context, marker, lines in sections:
+            # Continuation windows repeat the section marker so each piece names its section
+            header = "\n".join((title,) + context + ((marker,) if marker else ()))
+            budget = self.max_tokens - count_tokens(header) - 1
+            name = marker.lstrip("# ").rstrip(":")
+            for text in self._pack_lines(lines, budget):
+                pieces.append((context, name, f"{marker}\n{text}" if marker else text))
+
+        # Greedily merge neighbouring small pieces that share the same context
+        merged: List[Tuple[Tuple[str, ...], List[str], List[str]]] = []
+        for context, name, text in pieces:
+            if merged and merged[-1][0] == context:
+                candidate = "\n".join(merged[-1][2] + [text])
+                header = "\n".join((title,) + context)
+                if count_tokens(header + "\n" + candidate) <= self.max_tokens:
+                    merged[-1][2].append(text)
+                    if name not in merged[-1][1]:
+                        merged[-1][1].append(name)
+                    continue
+            merged.append((context, [name], [text]))
+
+        out: List[Document] = []
+        for i, (context, names, texts) in enumerate(merged):
+            body = "\n".join((title,) + context + tuple(texts))
+            out.append(Document(page_content=body, metadata={
+                **doc.metadata,
+                "chunk_index": i,
+                "chunk_count": len(merged),
+                "section": " / ".join(n for n in names if n),
+            }))
+        return out
+
+    def _sections(self, doc: Document) -> Tuple[str, List[Tuple[Tuple[str, ...], str, List[str]]]]:
+        lines = doc.page_content.split("\n")
+        title, rest = lines[0], lines[1:]
+        markers = SECTION_MARKERS.get(doc.metadata.get("source", ""), [])
+
+        sections: List[Tuple[Tuple[str, ...], str, List[str]]] = []
+        ancestors: List[str] = []
+        context: Tuple[str, ...] = ()
+        marker = ""
+        current: List[str] = []
+        for line in rest:
+            level = next((lvl for lvl, pattern in markers if pattern.match(line)), None)
+            if level is None:
+                current.append(line)
+                continue
+            if any(l.strip() for l in current):
+                sections.append((context, marker, current))
+            ancestors = ancestors[:level - 1] + [line]
+            context, marker, current = tuple(ancestors[:-1]), line, []
+        if any(l.strip() for l in current):
+            sections.append((context, marker, current))
+        return title, sections
+
+    def _pack_lines(self, lines: List[str], budget: int) -> List[str]:
+        """Pack lines into windows of `budget` tokens, carrying `overlap_tokens` of trailing lines."""
+        windows: List[str] = []
+        window: List[Tuple[str, int]] = []
+        used = 0
+        for line in lines:
+            if not line.strip() and not window:
+                continue
+            n = count_tokens(line) + 1
+            if n > budget:
+                if window:
+                    windows.append("\n".join(l for l, _ in window))
+                    window, used = [], 0
+                windows.extend(split_by_tokens(line, budget, self.overlap_tokens))
+                continue
+            if used + n > budget and window:
+                windows.append("\n".join(l for l, _ in window))
+                carry: List[Tuple[str, int]] = []
+                carried = 0
+                for prev, size in reversed(window):
+                    if carried + size > self.overlap_tokens:
+                        break
+                    carry.insert(0, (prev, size))
+                    carried += size
+                if carried + n > budget:
+                    carry, carried = [], 0
+                window, used = carry, carried
+            window.append((line, n))
+            used += n
+        if window and any(l.strip() for l, _ in window):
+            windows.append("\n".join(l for l, _ in window).strip("\n"))
+        return windows
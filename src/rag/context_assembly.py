@@ -0,0 +1,158 @@
+"""Packs retrieved chunks into a token-budgeted, de-duplicated prompt context."""
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Set
+
+from langchain_core.documents import Document
+
+from src.config import (
+    MODEL_PROVIDER, LLM_MAX_OUTPUT_TOKENS,
+    PROVIDER_CONTEXT, CONTEXT_PROMPT_RESERVE, CONTEXT_DEDUP_THRESHOLD,
+)
+from src.rag.index_store import document_id
+from src.utils.tokens import count_tokens, split_by_tokens
+
+SEPARATOR = "\n\n"
+SHINGLE_WORDS = 4
+
+# A "Heading:" line on its own, as written by the Jira and Figma clients
+_HEADING = re.compile(r"^[A-Z][A-Za-z0-9 /&()-]{0,40}:$")
+# Section bodies that carry no information
+_PLACEHOLDER = re.compile(r"^(?:n/?a|none|null|tbd|todo|-+|\.+|—)$", re.IGNORECASE)
+
+
+def context_budget(provider: str = MODEL_PROVIDER) -> int:
+    """Context tokens for `provider`: its configured budget, capped by what its window leaves free."""
+    window, budget = PROVIDER_CONTEXT.get(provider, (16385, 4000))
+    return max(256, min(budget, window - LLM_MAX_OUTPUT_TOKENS - CONTEXT_PROMPT_RESERVE))
+
+
+def compress_boilerplate(text: str) -> str:
+    """Drop empty or placeholder-only sections, trailing spaces and runs of blank lines."""
+    lines = [re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines()]
+    kept: List[str] = []
+    i = 0
+    while i < len(lines):
+        if _HEADING.match(lines[i]):
+            j = i + 1
+            while j < len(lines) and (not lines[j] or _PLACEHOLDER.match(lines[j])):
+                j += 1
+            if j == len(lines) or _HEADING.match(lines[j]):
+                i = j  # empty section
+                continue
+        if lines[i] and _PLACEHOLDER.match(lines[i]):
+            i += 1
+            continue
+        if lines[i] or (kept and kept[-1]):
+            kept.append(lines[i])
+        i += 1
+    return "\n".join(kept).strip()
+
+
+def shingles(text: str) -> Set[tuple]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+@dataclass
+class AssembledContext:
+    text: str
+    tokens: int
+    budget: int
+    chunks_in: int
+    chunks_used: int
+    duplicates: int
+    raw_tokens: int
+
+    def summary(self) -> str:
+        return (f"{self.chunks_used}/{self.chunks_in} chunks, {self.tokens}/{self.budget} tokens "
+                f"({self.raw_tokens} before assembly), {self.duplicates} near-duplicates dropped")
+
+
+class ContextAssembler:
+    """Turns retrieved chunks (most relevant first) into the prompt context.
+
+    Chunks are cleaned of empty sections, dropped when most of their word
+    shingles already appear in more relevant packed chunks, and greedily
+    packed by relevance into `budget_tokens`. The packed chunks are then
+    grouped per source document (documents in order of their best chunk,
+    chunks in document order); the repeated title line of a document's
+    later chunks and the overlap between neighbouring chunks are dropped.
+    Totals across calls are kept for the run summary.
+    """
+
+    def __init__(self, budget_tokens: Optional[int] = None, dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD):
+        self.budget_tokens = budget_tokens or context_budget()
+        self.dedup_threshold = dedup_threshold
+        self._totals = {"calls": 0, "chunks_in": 0, "chunks_used": 0, "duplicates": 0,
+                        "raw_tokens": 0, "tokens": 0}
+        self._lock = threading.Lock()
+
+    def assemble(self, docs: Sequence[Document], budget_tokens: Optional[int] = None,
+                 exclude: Sequence[Document] = ()) -> AssembledContext:
+        """Context from `docs`; passages already covered by `exclude` (e.g. text the prompt
+        carries anyway) count as duplicates."""
+        budget = self.budget_tokens if budget_tokens is None else budget_tokens
+        seen: Set[tuple] = set()
+        for doc in exclude:
+            seen |= shingles(doc.page_content)
+
+        picked: List[tuple] = []  # (relevance rank, doc, text)
+        used, duplicates, raw_tokens = 0, 0, 0
+        for rank, doc in enumerate(docs):
+            raw_tokens += count_tokens(doc.page_content)
+            text = compress_boilerplate(doc.page_content)
+            grams = shingles(text)
+            if not grams or len(grams & seen) >= self.dedup_threshold * len(grams):
+                duplicates += 1
+                continue
+            cost = count_tokens(text) + (2 if picked else 0)
+            if used + cost > budget:
+                if picked or budget - used < 32:
+                    continue  # a smaller, less relevant chunk may still fit
+                # The most relevant chunk alone exceeds the budget: keep its head
+                text = split_by_tokens(text, budget - used)[0]
+                cost = count_tokens(text)
+            picked.append((rank, doc, text))
+            seen |= grams
+            used += cost
+
+        text = self._arrange(picked)
+        result = AssembledContext(text=text, tokens=count_tokens(text) if text else 0, budget=budget,
+                                  chunks_in=len(docs), chunks_used=len(picked), duplicates=duplicates,
+                                  raw_tokens=raw_tokens)
+        with self._lock:
+            self._totals["calls"] += 1
+            for key in ("chunks_in", "chunks_used", "duplicates", "raw_tokens", "tokens"):
+                self._totals[key] += getattr(result, key)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._totals, budget=self.budget_tokens)
+
+    @staticmethod
+    def _arrange(picked: List[tuple]) -> str:
+        groups: Dict[str, List[tuple]] = {}
+        for rank, doc, text in picked:
+            groups.setdefault(document_id(doc), []).append((doc.metadata.get("chunk_index", rank), text))
+        parts = []
+        for chunks in groups.values():  # insertion order = best rank first
+            chunks.sort(key=lambda c: c[0])
+            title = chunks[0][1].split("\n", 1)[0]
+            previous: Set[str] = set()
+            for i, (index, text) in enumerate(chunks):
+                lines = text.split("\n")
+                if i and lines[0] == title:
+                    lines = lines[1:]
+                if i and index == chunks[i - 1][0] + 1:
+                    # Neighbouring chunks overlap by a few lines; keep them once
+                    while lines and lines[0] in previous:
+                        lines = lines[1:]
+                previous = set(text.split("\n"))
+                if any(lines):
+                    parts.append("\n".join(lines))
+        return SEPARATOR.join(parts)
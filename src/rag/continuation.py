@@ -0,0 +1,55 @@
+"""Output sizing and continuation of truncated LLM replies."""
+import re
+from typing import List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.config import LLM_MIN_OUTPUT_TOKENS, LLM_MAX_OUTPUT_TOKENS
+from src.prompts.templates import CONTINUE_INSTRUCTIONS
+from src.rag.output_parsing import schema_name
+from src.utils.tokens import count_tokens
+
+# finish_reason / stop_reason values meaning "hit max_tokens" (OpenAI & Groq, Anthropic, Cohere)
+TRUNCATION_REASONS = {"length", "max_tokens", "MAX_TOKENS"}
+
+# Expected reply size per schema: (base tokens, tokens per prompt token). Case lists
+# grow with the requirements in the context; a plan stays roughly constant; the one-shot
+# bundle is all three together.
+OUTPUT_TOKEN_ESTIMATES = {
+    "GenerationBundle": (1500, 2.25),
+    "TestPlan": (600, 0.25),
+    "TestScenario": (300, 0.5),
+    "TestCase": (600, 1.5),
+}
+
+_LEADING_FENCE = re.compile(r"^\s*```(?:json)?\s*", re.IGNORECASE)
+
+
+def output_token_budget(schema, messages: List[BaseMessage]) -> int:
+    """max_tokens for one call: estimated from the prompt size, clamped to the configured range."""
+    name = schema_name(schema)
+    base, ratio = next((v for k, v in OUTPUT_TOKEN_ESTIMATES.items() if k in name), (600, 1.0))
+    prompt_tokens = sum(count_tokens(message_text(m)) for m in messages)
+    return max(LLM_MIN_OUTPUT_TOKENS, min(LLM_MAX_OUTPUT_TOKENS, int(base + ratio * prompt_tokens)))
+
+
+def message_text(message: BaseMessage) -> str:
+    """Text of a message whose content is a string or a list of content blocks (e.g. cache_control)."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in message.content)
+
+
+def is_truncated(message: BaseMessage) -> bool:
+    meta = getattr(message, "response_metadata", None) or {}
+    return (meta.get("finish_reason") or meta.get("stop_reason")) in TRUNCATION_REASONS
+
+
+def continuation_messages(messages: List[BaseMessage], partial: str) -> List[BaseMessage]:
+    """The original conversation plus the partial reply and a request to carry on."""
+    return list(messages) + [AIMessage(content=partial), HumanMessage(content=CONTINUE_INSTRUCTIONS)]
+
+
+def strip_leading_fence(text: str) -> str:
+    """Continuations sometimes reopen a ```json fence; the parser must not see it mid-document."""
+    return _LEADING_FENCE.sub("", text, count=1)
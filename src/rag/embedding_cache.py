@@ -0,0 +1,241 @@
+"""Content-addressed embedding cache shared across runs and projects."""
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+VECTORS_FILE = "vectors.f32"
+KEYS_FILE = "keys.log"
+LOCK_FILE = "cache.lock"
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive lock on `path` held across processes for the duration of the block."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that reuses vectors for text it has seen before.
+
+    Entries are keyed by (model name, text hash). Vectors live in one flat
+    float32 file per model, read through a memory map; an append-only key log
+    records the row of each entry. New vectors are buffered in memory and
+    written `flush_every` at a time (and at exit). Writers in several
+    processes serialize on a lock file and pick up each other's entries before
+    appending. Once over `max_entries` the files are rewritten keeping the
+    most recently used entries.
+    """
+
+    def __init__(self, embedder: Embeddings, model_name: str, cache_dir: str, max_entries: int = 200_000,
+                 flush_every: int = 256):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.flush_every = max(1, flush_every)
+        self.path = Path(cache_dir) / re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+        self.hits = 0
+        self.misses = 0
+        self._dim: Optional[int] = None
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._disk: Optional[np.ndarray] = None
+        self._pending: Dict[str, np.ndarray] = {}
+        # Identity of the key log read so far and how far; a compaction elsewhere replaces the file
+        self._log_id: Optional[tuple] = None
+        self._log_offset = 0
+        self._lock = threading.Lock()
+        if (self.path / KEYS_FILE).exists():
+            with self._locked():
+                self._refresh()
+        atexit.register(self.flush)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, query=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], query=True)[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._rows) + len(self._pending),
+        }
+
+    def _key(self, text: str, query: bool) -> str:
+        kind = "q" if query else "d"
+        return hashlib.sha256(f"{self.model_name}\x00{kind}\x00{text}".encode("utf-8")).hexdigest()[:32]
+
+    def _embed(self, texts: List[str], query: bool) -> List[List[float]]:
+        keys = [self._key(t, query) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        with self._lock:
+            for key, text in zip(keys, texts):
+                if key in found or key in missing:
+                    continue
+                vec = self._get(key)
+                if vec is None:
+                    missing[key] = text
+                else:
+                    found[key] = vec
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            # Encoding is the slow part; other threads keep reading the cache meanwhile
+            miss_texts = list(missing.values())
+            if query:
+                vectors = [self.embedder.embed_query(miss_texts[0])]
+            else:
+                vectors = self.embedder.embed_documents(miss_texts)
+            with self._lock:
+                for key, vec in zip(missing, vectors):
+                    arr = np.asarray(vec, dtype=np.float32)
+                    self._dim = self._dim or arr.shape[0]
+                    self._pending[key] = arr
+                    found[key] = arr
+                if len(self._pending) >= self.flush_every:
+                    self._flush()
+        return [found[k].tolist() for k in keys]
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        if key in self._pending:
+            return self._pending[key]
+        row = self._rows.get(key)
+        if row is None:
+            return None
+        self._rows.move_to_end(key)
+        return np.array(self._disk[row])
+
+    def flush(self):
+        """Write buffered vectors to disk and evict least-recently-used entries over the bound."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._locked():
+            self._refresh()
+            pending = [(k, v) for k, v in self._pending.items() if k not in self._rows]
+            self._pending.clear()
+            keys_path = self.path / KEYS_FILE
+            vectors_path = self.path / VECTORS_FILE
+            start = vectors_path.stat().st_size // (4 * self._dim) if vectors_path.exists() else 0
+            # Vectors first: a key line is only written once its row is complete
+            with open(vectors_path, "ab") as f:
+                for key, vec in pending:
+                    f.write(vec.tobytes())
+            lines = [] if keys_path.exists() else [self._header()]
+            for i, (key, _) in enumerate(pending):
+                self._rows[key] = start + i
+                lines.append(f"{key} {start + i}\n")
+            with open(keys_path, "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+            self._log_id, self._log_offset = self._file_id(keys_path), keys_path.stat().st_size
+
+            if len(self._rows) > self.max_entries:
+                self._compact()
+            self._map()
+
+    def _compact(self):
+        """Rewrite both files with the `max_entries` most recently used entries (file lock held)."""
+        self._map()
+        while len(self._rows) > self.max_entries:
+            self._rows.popitem(last=False)
+        kept = np.empty((len(self._rows), self._dim), dtype=np.float32)
+        lines = [self._header()]
+        for i, (key, row) in enumerate(self._rows.items()):
+            kept[i] = self._disk[row]
+            self._rows[key] = i
+            lines.append(f"{key} {i}\n")
+        self._disk = None
+        tmp = self.path / (VECTORS_FILE + ".tmp")
+        kept.tofile(tmp)
+        os.replace(tmp, self.path / VECTORS_FILE)
+        keys_path = self.path / KEYS_FILE
+        tmp = self.path / (KEYS_FILE + ".tmp")
+        tmp.write_text("".join(lines), encoding="utf-8")
+        os.replace(tmp, keys_path)
+        self._log_id, self._log_offset = self._file_id(keys_path), keys_path.stat().st_size
+
+    def _refresh(self):
+        """Read key log lines written since the last read (file lock held)."""
+        keys_path = self.path / KEYS_FILE
+        if not keys_path.exists():
+            self._rows.clear()
+            self._log_id, self._log_offset = None, 0
+            return
+        log_id = self._file_id(keys_path)
+        if log_id != self._log_id:
+            # First read, or another process compacted the cache: rows were renumbered
+            self._rows.clear()
+            self._log_id, self._log_offset = log_id, 0
+        with open(keys_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # A torn last line (crash mid-write) has no newline yet; leave it unread
+        data = data[:data.rfind(b"\n") + 1]
+        lines = data.decode("utf-8").splitlines()
+        if self._log_offset == 0 and lines:
+            self._dim = json.loads(lines.pop(0)).get("dim") or self._dim
+        self._log_offset += len(data)
+        for line in lines:
+            key, row = line.split()
+            self._rows[key] = int(row)
+        self._map()
+        rows = self._disk.shape[0] if self._disk is not None else 0
+        # Rows past the end of the file were never fully written; drop them.
+        for key in [k for k, r in self._rows.items() if r >= rows]:
+            del self._rows[key]
+
+    def _map(self):
+        vectors_path = self.path / VECTORS_FILE
+        rows = vectors_path.stat().st_size // (4 * self._dim) if self._dim and vectors_path.exists() else 0
+        if rows:
+            self._disk = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=(rows, self._dim))
+        else:
+            self._disk = None
+
+    def _header(self) -> str:
+        return json.dumps({"model": self.model_name, "dim": self._dim}) + "\n"
+
+    def _locked(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        return _file_lock(self.path / LOCK_FILE)
+
+    @staticmethod
+    def _file_id(path: Path) -> tuple:
+        st = path.stat()
+        return st.st_ino, st.st_dev
@@ -0,0 +1,104 @@
+"""sentence-transformers embedding engine with batch, thread and process control."""
+import atexit
+import os
+import threading
+import time
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingEngine(Embeddings):
+    """Drop-in replacement for HuggingFaceEmbeddings tuned for bulk indexing.
+
+    `batch_size` is passed to the encoder. With `processes` > 1, large
+    document batches go through a persistent sentence-transformers
+    multi-process pool (started on first use, stopped at exit) and each
+    worker is pinned to `threads` intra-op threads (default: cores divided
+    by workers) so the pool does not oversubscribe the CPU. Small batches
+    and queries are encoded in-process, where `threads` sets torch's thread
+    count. Vectors are identical to HuggingFaceEmbeddings' defaults.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, processes: int = 0, threads: int = 0,
+                 device: Optional[str] = None, normalize: bool = False):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.processes = processes
+        self.threads = threads
+        self.normalize = normalize
+        self.docs = 0
+        self.seconds = 0.0
+        if threads and processes <= 1:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = SentenceTransformer(model_name, device=device)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        texts = [t.replace("\n", " ") for t in texts]
+        started = time.perf_counter()
+        if self.processes > 1 and len(texts) >= self.batch_size * self.processes:
+            vectors = self._encode_pool(texts)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, show_progress_bar=False,
+                                        normalize_embeddings=self.normalize)
+        with self._lock:
+            self.docs += len(texts)
+            self.seconds += time.perf_counter() - started
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode([text.replace("\n", " ")], show_progress_bar=False,
+                                 normalize_embeddings=self.normalize)[0].tolist()
+
+    def stats(self) -> dict:
+        return {
+            "docs": self.docs,
+            "seconds": self.seconds,
+            "docs_per_sec": self.docs / self.seconds if self.seconds else 0.0,
+            "processes": self.processes,
+            "batch_size": self.batch_size,
+        }
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            self.model.stop_multi_process_pool(pool)
+
+    def _encode_pool(self, texts: List[str]):
+        pool = self._start_pool()
+        # Several chunks per worker keeps them busy while results are collected
+        chunk_size = max(self.batch_size, len(texts) // (self.processes * 4))
+        if hasattr(self.model, "encode_multi_process"):
+            vectors = self.model.encode_multi_process(texts, pool, batch_size=self.batch_size, chunk_size=chunk_size)
+        else:
+            vectors = self.model.encode(texts, pool=pool, batch_size=self.batch_size, chunk_size=chunk_size,
+                                        show_progress_bar=False)
+        if self.normalize:
+            import numpy as np
+            vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors
+
+    def _start_pool(self):
+        with self._lock:
+            if self._pool is None:
+                threads = self.threads or max(1, (os.cpu_count() or 1) // self.processes)
+                # Workers read these when they import torch; restore the parent's settings afterwards
+                saved = {k: os.environ.get(k) for k in ("OMP_NUM_THREADS", "MKL_NUM_THREADS")}
+                os.environ.update({k: str(threads) for k in saved})
+                try:
+                    self._pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+                finally:
+                    for k, v in saved.items():
+                        if v is None:
+                            os.environ.pop(k, None)
+                        else:
+                            os.environ[k] = v
+                atexit.register(self.close)
+            return self._pool
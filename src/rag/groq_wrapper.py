@@ -1,17 +1,23 @@
 """Custom Groq LLM wrapper for LangChain compatibility."""
 import json
-from typing import Any, Dict, List, Optional
-from groq import Groq
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+from groq import AsyncGroq, Groq
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.messages import AIMessageChunk, BaseMessage, AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from pydantic import BaseModel, Field
 
+from src.clients.http import async_http_client, http_client
+
 
 class ChatGroq(BaseChatModel):
     """Groq chat model wrapper for LangChain."""
     
     client: Any = Field(default=None, exclude=True)
+    async_client: Any = Field(default=None, exclude=True)
     api_key: str
     model: str = "mixtral-8x7b-32768"
     temperature: float = 0.2
@@ -19,7 +25,15 @@ class ChatGroq(BaseChatModel):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.client = Groq(api_key=self.api_key)
+        # Connections come from the process-wide pools, shared by every ChatGroq instance
+        self.client = Groq(api_key=self.api_key, http_client=http_client())
+
+    def _async_groq(self) -> AsyncGroq:
+        """AsyncGroq on the shared pool of the running event loop."""
+        pool = async_http_client()
+        if self.async_client is None or self.async_client._client is not pool:
+            self.async_client = AsyncGroq(api_key=self.api_key, http_client=pool)
+        return self.async_client
     
     @property
     def _llm_type(self) -> str:
@@ -39,26 +53,122 @@ class ChatGroq(BaseChatModel):
                 groq_messages.append({"role": "user", "content": str(msg.content)})
         return groq_messages
     
+    def _request(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> Dict[str, Any]:
+        params = {
+            "model": self.model,
+            "messages": self._convert_messages(messages),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+        if stop:
+            params["stop"] = stop
+        params.update(kwargs)
+        return params
+
+    @staticmethod
+    def _usage(usage: Any) -> Optional[UsageMetadata]:
+        if usage is None:
+            return None
+        metadata = UsageMetadata(input_tokens=usage.prompt_tokens or 0, output_tokens=usage.completion_tokens or 0,
+                                 total_tokens=usage.total_tokens or 0)
+        # Prompt tokens served from Groq's prompt cache (models that support it)
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if cached:
+            metadata["input_token_details"] = {"cache_read": cached}
+        return metadata
+
+    def _result(self, response: Any, started: float) -> ChatResult:
+        choice = response.choices[0]
+        message = AIMessage(
+            content=choice.message.content or "",
+            usage_metadata=self._usage(response.usage),
+            response_metadata={
+                "model_name": response.model,
+                "finish_reason": choice.finish_reason,
+                "latency": time.perf_counter() - started,
+            },
+        )
+        generation = ChatGeneration(message=message, generation_info={"finish_reason": choice.finish_reason})
+        return ChatResult(generations=[generation])
+
+    def _chunk(self, chunk: Any, started: float, first: bool) -> Optional[ChatGenerationChunk]:
+        """Convert a streamed Groq chunk. The first content chunk carries the time to
+        first token; the last one the finish reason, token usage and total latency."""
+        choice = chunk.choices[0] if chunk.choices else None
+        text = (choice.delta.content or "") if choice else ""
+        finish_reason = choice.finish_reason if choice else None
+        usage = chunk.usage or (chunk.x_groq.usage if getattr(chunk, "x_groq", None) else None)
+        if not text and finish_reason is None and usage is None:
+            return None
+        metadata: Dict[str, Any] = {}
+        if first and text:
+            metadata["time_to_first_token"] = time.perf_counter() - started
+        if finish_reason is not None:
+            metadata.update(model_name=chunk.model, finish_reason=finish_reason,
+                            latency=time.perf_counter() - started)
+        message = AIMessageChunk(content=text, usage_metadata=self._usage(usage), response_metadata=metadata)
+        info = {"finish_reason": finish_reason} if finish_reason is not None else None
+        return ChatGenerationChunk(message=message, generation_info=info)
+
     def _generate(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
         """Generate response from Groq API."""
-        groq_messages = self._convert_messages(messages)
-        
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=groq_messages,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-            **kwargs
-        )
-        
-        message = AIMessage(content=response.choices[0].message.content)
-        generation = ChatGeneration(message=message)
-        return ChatResult(generations=[generation])
+        started = time.perf_counter()
+        response = self.client.chat.completions.create(**self._request(messages, stop, **kwargs))
+        return self._result(response, started)
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        started = time.perf_counter()
+        response = await self._async_groq().chat.completions.create(**self._request(messages, stop, **kwargs))
+        return self._result(response, started)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        first = True
+        for chunk in self.client.chat.completions.create(stream=True, **self._request(messages, stop, **kwargs)):
+            generation = self._chunk(chunk, started, first)
+            if generation is None:
+                continue
+            first = first and not generation.text
+            if run_manager:
+                run_manager.on_llm_new_token(generation.text, chunk=generation)
+            yield generation
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        started = time.perf_counter()
+        first = True
+        stream = await self._async_groq().chat.completions.create(stream=True, **self._request(messages, stop, **kwargs))
+        async for chunk in stream:
+            generation = self._chunk(chunk, started, first)
+            if generation is None:
+                continue
+            first = first and not generation.text
+            if run_manager:
+                await run_manager.on_llm_new_token(generation.text, chunk=generation)
+            yield generation
     
     def with_structured_output(self, schema: BaseModel):
         """Enable structured output by wrapping the model."""
@@ -0,0 +1,168 @@
+"""Hybrid retrieval: in-process BM25 fused with FAISS results, plus optional cross-encoder rerank."""
+import math
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from src.config import HYBRID_FETCH_K, RRF_K, RERANK_CANDIDATES
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+# Words plus compound identifiers such as ABC-123, ERR_401, v2.3 or login.button
+_TOKEN = re.compile(r"[A-Za-z0-9]+(?:[-_./][A-Za-z0-9]+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased terms; a compound identifier is kept whole and also split into its parts."""
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part)
+    return terms
+
+
+def identifiers(text: str) -> List[str]:
+    """Exact-match terms of `text` (anything containing a digit or joiner), sorted and de-duplicated."""
+    return sorted({t for t in _TOKEN.findall(text.lower()) if not t.isalpha()})
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index of term -> [(doc position, term frequency)]."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []
+        self.lengths: List[int] = []
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+
+    def add(self, doc_ids: Sequence[str], texts: Sequence[str]):
+        for doc_id, text in zip(doc_ids, texts):
+            pos = len(self.ids)
+            terms = tokenize(text)
+            self.ids.append(doc_id)
+            self.lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                self.postings.setdefault(term, []).append((pos, tf))
+
+    def search(self, query: str, k: int, accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Top `k` (doc id, score); `accept` filters doc ids (e.g. a metadata filter)."""
+        if not self.ids:
+            return []
+        n = len(self.ids)
+        avg_len = sum(self.lengths) / n or 1.0
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for pos, tf in postings:
+                norm = tf + self.k1 * (1 - self.b + self.b * self.lengths[pos] / avg_len)
+                scores[pos] = scores.get(pos, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        hits = []
+        for pos, score in ranked:
+            if accept is None or accept(self.ids[pos]):
+                hits.append((self.ids[pos], score))
+                if len(hits) == k:
+                    break
+        return hits
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Merge ranked id lists by summing 1 / (k + rank); ids found by several lists rise to the top."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda doc_id: scores[doc_id], reverse=True)
+
+
+class CrossEncoderReranker:
+    """Scores (query, passage) pairs with a local sentence-transformers cross-encoder."""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import CrossEncoder
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name)
+
+    def rerank(self, query: str, docs: List[Document], top_n: int) -> List[Document]:
+        if len(docs) <= 1:
+            return docs[:top_n]
+        scores = self.model.predict([(query, d.page_content) for d in docs], show_progress_bar=False)
+        order = sorted(range(len(docs)), key=lambda i: float(scores[i]), reverse=True)
+        return [docs[i] for i in order[:top_n]]
+
+
+@lru_cache(maxsize=4)
+def get_reranker(model_name: str) -> CrossEncoderReranker:
+    """One loaded cross-encoder per model name, shared by every generator in the process."""
+    return CrossEncoderReranker(model_name)
+
+
+class HybridSearcher:
+    """BM25 + dense search over one FAISS vectorstore, fused with reciprocal rank fusion.
+
+    The BM25 index is built from the vectorstore's docstore on first use.
+    Both retrievers fetch `fetch_k` candidates, and BM25 hits containing the
+    query's identifiers are fused as a third ranking so an exact Jira key or
+    error code is not outvoted by dense neighbours. The fused list is cut to `k`,
+    or to `rerank_candidates` for the cross-encoder when a reranker is set.
+    """
+
+    def __init__(self, vs: "FAISS", reranker: Optional[CrossEncoderReranker] = None,
+                 fetch_k: int = HYBRID_FETCH_K, rerank_candidates: int = RERANK_CANDIDATES):
+        self.vs = vs
+        self.reranker = reranker
+        self.fetch_k = fetch_k
+        self.rerank_candidates = rerank_candidates
+        self._bm25: Optional[BM25Index] = None
+        self._lock = threading.Lock()
+
+    @property
+    def bm25(self) -> BM25Index:
+        with self._lock:
+            if self._bm25 is None:
+                index = BM25Index()
+                ids = [self.vs.index_to_docstore_id[p] for p in sorted(self.vs.index_to_docstore_id)]
+                index.add(ids, [self.vs.docstore.search(doc_id).page_content for doc_id in ids])
+                self._bm25 = index
+            return self._bm25
+
+    def search(self, query: str, query_vector: Sequence[float], k: int,
+               filters: Optional[dict] = None) -> List[Document]:
+        fetch_k = max(self.fetch_k, k)
+        dense = self.vs.similarity_search_by_vector(query_vector, k=fetch_k, filter=filters,
+                                                    fetch_k=max(fetch_k * 4, 20))
+        by_id = {self._doc_key(d): d for d in dense}
+        accept = None
+        if filters:
+            matches = self.vs._create_filter_func(filters)
+            accept = lambda doc_id: matches(self.vs.docstore.search(doc_id).metadata)
+        wanted = set(identifiers(query))
+        lexical, matched = [], []
+        for doc_id, _ in self.bm25.search(query, fetch_k, accept):
+            doc = self.vs.docstore.search(doc_id)
+            lexical.append(self._doc_key(doc))
+            by_id.setdefault(lexical[-1], doc)
+            if wanted:
+                matched.append((len(wanted & set(tokenize(doc.page_content))), lexical[-1]))
+        # Chunks that contain the query's identifiers (Jira keys, error codes) get a third vote
+        exact = [key for hits, key in sorted(matched, key=lambda m: -m[0]) if hits]
+        fused = reciprocal_rank_fusion([[self._doc_key(d) for d in dense], lexical, exact])
+        if self.reranker is None:
+            return [by_id[doc_id] for doc_id in fused[:k]]
+        candidates = [by_id[doc_id] for doc_id in fused[:max(k, self.rerank_candidates)]]
+        return self.reranker.rerank(query, candidates, k)
+
+    @staticmethod
+    def _doc_key(doc: Document) -> str:
+        # Docstore id when the store set one (stores written by older LangChain versions may not)
+        return doc.id or doc.page_content
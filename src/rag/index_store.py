@@ -0,0 +1,267 @@
+"""Persistent, incrementally-updated FAISS index store."""
+import hashlib
+import json
+import os
+import pickle
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "index.pkl"
+MANIFEST_FILE = "manifest.json"
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def jira_document_id(key: str) -> str:
+    return f"jira:{key}"
+
+
+def document_id(doc: Document) -> str:
+    """Stable id for a source document (Jira issue, Figma file, or content hash)."""
+    meta = doc.metadata or {}
+    if meta.get("jira_key"):
+        return jira_document_id(meta["jira_key"])
+    if meta.get("figma_key"):
+        # File names are not unique across a team; the file key is
+        return f"figma:{meta['figma_key']}"
+    if meta.get("figma_file"):
+        return f"figma:{meta['figma_file']}"
+    return f"sha:{content_hash(doc.page_content)[:16]}"
+
+
+@dataclass
+class IndexSyncResult:
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    embedded: int = 0
+    rebuilt: Optional[str] = None  # index kind, when the index was rebuilt rather than updated in place
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        text = (f"{len(self.added)} added, {len(self.changed)} changed, {len(self.removed)} removed, "
+                f"{len(self.unchanged)} unchanged ({self.embedded} vectors embedded)")
+        return text + (f", {self.rebuilt} index rebuilt" if self.rebuilt else "")
+
+
+class IndexStore:
+    """FAISS index persisted on disk and keyed by document id + content hash.
+
+    The manifest maps every document id to the hash of its content and the
+    vector ids it owns, so a sync only embeds new or changed documents and
+    drops the vectors of documents that disappeared. When nothing changed the
+    index is loaded memory-mapped and read-only.
+
+    The FAISS index kind (see ann_index) follows `index_kind`, or the corpus
+    size when it is "auto", and is recorded in the manifest with its build
+    parameters. Exact indexes are updated in place; trained ANN indexes take
+    appends in place but are rebuilt from their retained vectors on deletes
+    (HNSW cannot delete, IVF ids do not compact) and retrained when the kind
+    changes or the corpus has outgrown the training set.
+    """
+
+    def __init__(self, path: Path, embeddings: Embeddings, embed_model: str, index_kind: str = "auto"):
+        self.path = Path(path)
+        self.embeddings = embeddings
+        self.embed_model = embed_model
+        self.index_kind = index_kind
+        self.manifest = self._read_manifest()
+        self.vs: Optional["FAISS"] = None
+        self._mmapped = False
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @property
+    def kind(self) -> str:
+        return self.manifest.get("index", {}).get("kind", "flat")
+
+    @property
+    def vectorstore(self) -> "FAISS":
+        if self.vs is None:
+            self._load(mmap=True)
+        return self.vs
+
+    def sync(self, docs: List[Document]) -> IndexSyncResult:
+        """Make the index reflect exactly `docs`, embedding only what changed."""
+        return self._update(docs, removed=None)
+
+    def upsert(self, docs: List[Document], removed: List[str]) -> IndexSyncResult:
+        """Apply a change set: add/replace `docs` and delete the `removed` document ids.
+
+        Documents already in the index but absent from `docs` are left alone.
+        """
+        return self._update(docs, removed=removed)
+
+    def _update(self, docs: List[Document], removed: Optional[List[str]]) -> IndexSyncResult:
+        if self.vs is None:
+            self._load(mmap=True)
+        groups = self._group(docs)
+        known: Dict[str, dict] = self.manifest["docs"]
+        result = IndexSyncResult()
+        upserts: Dict[str, List[Document]] = {}
+        for doc_id, (digest, group) in groups.items():
+            entry = known.get(doc_id)
+            if entry is None:
+                result.added.append(doc_id)
+                upserts[doc_id] = group
+            elif entry["hash"] != digest:
+                result.changed.append(doc_id)
+                upserts[doc_id] = group
+            else:
+                result.unchanged.append(doc_id)
+        if removed is None:
+            result.removed = [doc_id for doc_id in known if doc_id not in groups]
+        else:
+            result.removed = [doc_id for doc_id in removed if doc_id in known and doc_id not in groups]
+
+        kind_changed = self.index_kind not in ("auto", self.kind)
+        if not result.dirty and self.vs is not None and not kind_changed:
+            return result
+
+        self._apply(upserts, result.changed + result.removed, groups, result)
+        return result
+
+    def _apply(self, upserts: Dict[str, List[Document]], stale: List[str],
+               groups: Dict[str, tuple], result: IndexSyncResult):
+        from src.rag import ann_index
+        known = self.manifest["docs"]
+        if self._mmapped:
+            self._load(mmap=False)
+
+        stale_ids = [vid for doc_id in stale for vid in known[doc_id]["vector_ids"]]
+        if self.vs is None:
+            stale_ids = []
+        for doc_id in stale:
+            known.pop(doc_id, None)
+
+        new_docs: List[Document] = []
+        new_ids: List[str] = []
+        for doc_id, group in upserts.items():
+            vector_ids = [f"{doc_id}#{i}" for i in range(len(group))]
+            new_docs.extend(group)
+            new_ids.extend(vector_ids)
+            known[doc_id] = {"hash": groups[doc_id][0], "vector_ids": vector_ids}
+
+        size = (len(self.vs.index_to_docstore_id) if self.vs is not None else 0) - len(stale_ids) + len(new_docs)
+        # An emptied index has nothing to train on
+        kind = ann_index.choose_kind(size, self.index_kind) if size else "flat"
+        params = self.manifest.get("index", {}).get("params", {})
+        in_place = self.vs is not None and kind == self.kind and (
+            kind == "flat" or (not stale_ids and not ann_index.needs_retrain(kind, params, size)))
+        if in_place:
+            if stale_ids:
+                self.vs.delete(stale_ids)
+            if new_docs:
+                self.vs.add_documents(new_docs, ids=new_ids)
+        elif self.vs is not None or new_docs:
+            if self.vs is not None:
+                result.rebuilt = kind
+            self._rebuild(kind, stale_ids, new_docs, new_ids)
+        result.embedded = len(new_docs)
+
+        if self.vs is None:
+            raise ValueError("Cannot build an index from zero documents.")
+        self.manifest["version"] += 1
+        self._save()
+
+    def _rebuild(self, kind: str, stale_ids: List[str], new_docs: List[Document], new_ids: List[str]):
+        """Build a fresh `kind` index from the retained vectors plus `new_docs`.
+
+        Reuses the current training when the kind is unchanged and the corpus
+        has not outgrown it, so a delete only costs re-adding the vectors.
+        """
+        import numpy as np
+        from src.rag import ann_index
+        keep_docs: List[Document] = []
+        keep_ids: List[str] = []
+        parts = []
+        empty = None
+        params = self.manifest.get("index", {}).get("params", {})
+        if self.vs is not None:
+            stale = set(stale_ids)
+            mapping = self.vs.index_to_docstore_id
+            positions = [p for p in sorted(mapping) if mapping[p] not in stale]
+            keep_ids = [mapping[p] for p in positions]
+            keep_docs = [self.vs.docstore.search(vid) for vid in keep_ids]
+            if positions:
+                parts.append(ann_index.stored_vectors(self.vs, self.embeddings, positions))
+            size = len(positions) + len(new_docs)
+            if kind == self.kind and kind != "flat" and not ann_index.needs_retrain(kind, params, size):
+                empty = ann_index.empty_like(self.vs.index)
+        if new_docs:
+            parts.append(np.asarray(self.embeddings.embed_documents([d.page_content for d in new_docs]),
+                                    dtype=np.float32))
+        vectors = np.vstack(parts) if parts else np.empty((0, self.vs.index.d), dtype=np.float32)
+        if empty is None:
+            params = ann_index.index_params(kind, len(vectors), vectors.shape[1])
+        index = ann_index.build_index(kind, vectors, params, empty=empty)
+        self.vs = ann_index.make_vectorstore(self.embeddings, index, keep_docs + new_docs, keep_ids + new_ids)
+        self.manifest["index"] = {"kind": kind, "params": params}
+
+    def _group(self, docs: List[Document]) -> Dict[str, tuple]:
+        grouped: Dict[str, List[Document]] = {}
+        for doc in docs:
+            grouped.setdefault(document_id(doc), []).append(doc)
+        return {
+            doc_id: (content_hash("\x00".join(d.page_content for d in group)), group)
+            for doc_id, group in grouped.items()
+        }
+
+    def _files_exist(self) -> bool:
+        return (self.path / INDEX_FILE).exists() and (self.path / DOCSTORE_FILE).exists()
+
+    def _read_manifest(self) -> dict:
+        empty = {"version": 0, "embed_model": self.embed_model, "docs": {}}
+        manifest_path = self.path / MANIFEST_FILE
+        if not manifest_path.exists() or not self._files_exist():
+            return empty
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        if manifest.get("embed_model") != self.embed_model:
+            # Vectors from another model are useless; start over.
+            return {**empty, "version": manifest.get("version", 0)}
+        return manifest
+
+    def _load(self, mmap: bool):
+        if not self._files_exist():
+            return
+        # Deferred so that importing this module (e.g. for jira_document_id) stays cheap
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from src.rag import ann_index
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = ann_index.configure_search(faiss.read_index(str(self.path / INDEX_FILE), flags))
+        with open(self.path / DOCSTORE_FILE, "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        expected = {vid for entry in self.manifest["docs"].values() for vid in entry["vector_ids"]}
+        if expected != set(index_to_docstore_id.values()):
+            # Interrupted save left the manifest and index out of step; re-embed everything.
+            self.manifest["docs"] = {}
+            self.vs = None
+            self._mmapped = False
+            return
+        self.vs = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+        self._mmapped = mmap
+
+    def _save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.vs.save_local(str(self.path))
+        tmp = self.path / (MANIFEST_FILE + ".tmp")
+        tmp.write_text(json.dumps(self.manifest, indent=2), encoding="utf-8")
+        os.replace(tmp, self.path / MANIFEST_FILE)
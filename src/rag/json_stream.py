@@ -0,0 +1,139 @@
+"""Single-pass incremental JSON parser for streamed LLM output."""
+import json
+import re
+from typing import Any, List, Optional, Sequence
+
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # LLMs like trailing commas; only pay for the fix-up when parsing fails
+        return json.loads(_TRAILING_COMMA.sub(r"\1", text))
+
+
+class JsonItemStream:
+    """Consumes LLM output chunk by chunk and emits array items as soon as they close.
+
+    Text before the first `{`/`[` (prose, a ```json fence) and after the
+    root value closes is ignored. The item array is the root array, or an
+    array stored under one of `item_keys` in the root object (for example
+    `{"testCases": [...]}`); every object in it is parsed and returned from
+    `feed` the moment its closing brace arrives. `result()` returns the whole
+    root value, recovering what it can when the output was truncated.
+    """
+
+    def __init__(self, item_keys: Sequence[str] = ()):
+        self.item_keys = set(item_keys)
+        self.items: List[Any] = []
+        self.done = False
+        self._root: List[str] = []       # chunks of the root value seen so far
+        self._stack: List[str] = []      # open containers
+        self._in_string = False
+        self._escape = False
+        self._key_chars: Optional[List[str]] = None  # string being read at root-object level
+        self._last_key: Optional[str] = None
+        self._item_depth: Optional[int] = None       # stack depth of the item array
+        self._item_key: Optional[str] = None         # root-object key holding the item array
+        self._item_chars: Optional[List[str]] = None  # current item being collected
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Scan `chunk` and return the items completed by it."""
+        completed: List[Any] = []
+        if self.done or not chunk:
+            return completed
+        start = None
+        for i, ch in enumerate(chunk):
+            if not self._stack and not self._root and start is None:
+                if ch not in "{[":
+                    continue
+                start = i
+            if self._item_chars is not None:
+                self._item_chars.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_chars is not None:
+                        self._last_key = "".join(self._key_chars)
+                        self._key_chars = None
+                elif self._key_chars is not None:
+                    self._key_chars.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                if len(self._stack) == 1 and self._stack[0] == "{":
+                    self._key_chars = []
+            elif ch in "{[":
+                if ch == "{" and self._item_chars is None and self._is_item_array():
+                    self._item_chars = [ch]
+                if ch == "[" and self._item_depth is None and self._opens_item_array():
+                    self._item_depth = len(self._stack) + 1
+                    self._item_key = self._last_key if self._stack else None
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if self._item_chars is not None and ch == "}" and len(self._stack) == self._item_depth:
+                    try:
+                        item = _loads("".join(self._item_chars))
+                        self.items.append(item)
+                        completed.append(item)
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_chars = None
+                if not self._stack:
+                    self._root.append(chunk[start or 0:i + 1])
+                    self.done = True
+                    return completed
+        if self._stack:
+            self._root.append(chunk[start or 0:])
+        return completed
+
+    def _opens_item_array(self) -> bool:
+        if not self._stack:
+            return True
+        return len(self._stack) == 1 and self._stack[0] == "{" and self._last_key in self.item_keys
+
+    def _is_item_array(self) -> bool:
+        return self._item_depth is not None and len(self._stack) == self._item_depth and self._stack[-1] == "["
+
+    def result(self) -> Any:
+        """The parsed root value; for truncated output, the items parsed so far or the
+        document with its open strings and containers closed."""
+        text = "".join(self._root)
+        if not text:
+            raise ValueError("Failed to parse JSON. No JSON value found in the response.")
+        try:
+            return _loads(text)
+        except json.JSONDecodeError as e:
+            if self.done:
+                raise ValueError(f"Failed to parse JSON. Error: {e}")
+            error = e
+        if self.items and self._item_depth == 1:
+            return list(self.items)
+        closed = text + ('"' if self._in_string else "")
+        closed = closed.rstrip().rstrip(",:").rstrip()
+        closed += "".join("}" if c == "{" else "]" for c in reversed(self._stack))
+        try:
+            return _loads(closed)
+        except json.JSONDecodeError:
+            pass
+        if self.items:
+            return {self._item_key or "items": list(self.items)}
+        raise ValueError(f"Failed to parse JSON. Error: {error}")
+
+
+def parse_json_text(text: str, item_keys: Sequence[str] = ()) -> Any:
+    """Parse a complete LLM response with the same single pass used for streams."""
+    stream = JsonItemStream(item_keys)
+    stream.feed(text)
+    return stream.result()
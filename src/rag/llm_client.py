@@ -0,0 +1,521 @@
+"""Resilient LLM client: per-provider rate limits, retries with jittered backoff, circuit
+breaking and failover across the configured providers."""
+import asyncio
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.ai import add_usage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import Field
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from src.config import (
+    PROVIDER_LIMITS, PROVIDER_TOKEN_LIMITS,
+    LLM_RETRIES, LLM_BACKOFF_BASE, LLM_BACKOFF_MAX,
+    LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS,
+    LLM_MAX_OUTPUT_TOKENS,
+)
+from src.clients.http import retry_after_seconds
+from src.rag.continuation import message_text
+from src.utils.rate_limit import ConcurrencyGate, TokenBucket
+from src.utils.tokens import count_tokens
+
+# Providers whose LangChain models implement with_structured_output natively
+STRUCTURED_OUTPUT_PROVIDERS = ("openai", "anthropic")
+
+# 408/409 and 5xx (529 = Anthropic overloaded) are transient; auth errors and unknown models
+# mean this provider cannot serve the call, but another one may
+RETRYABLE_STATUS = {408, 409, 429, 529}
+FAILOVER_STATUS = {401, 403, 404}
+# SDK errors raised without an HTTP status (groq/openai/anthropic, cohere, httpx, requests, builtins)
+RETRYABLE_ERRORS = {
+    "APIConnectionError", "APITimeoutError", "TooManyRequestsError", "ServiceUnavailableError",
+    "InternalServerError", "GatewayTimeoutError", "TransportError", "TimeoutException",
+    "ConnectionError", "Timeout", "TimeoutError",
+}
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def error_action(exc: BaseException) -> str:
+    """"retry" for transient errors, "failover" when the provider cannot serve the call at
+    all, "raise" for errors another attempt would repeat (bad request, parsing)."""
+    code = status_code(exc)
+    if code is not None:
+        if code in RETRYABLE_STATUS or code >= 500:
+            return "retry"
+        return "failover" if code in FAILOVER_STATUS else "raise"
+    if any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__):
+        return "retry"
+    return "failover" if isinstance(exc, ImportError) else "raise"
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds the provider asked us to wait (Retry-After header), if it said."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers or not headers.get("Retry-After"):
+        return None
+    return retry_after_seconds(response, 0.0)
+
+
+def _should_retry(exc: BaseException) -> bool:
+    # A Retry-After longer than our own backoff cap is better spent on the next provider
+    delay = retry_after(exc)
+    return error_action(exc) == "retry" and (delay is None or delay <= LLM_BACKOFF_MAX)
+
+
+_jitter = wait_random_exponential(multiplier=LLM_BACKOFF_BASE, max=LLM_BACKOFF_MAX)
+
+
+def _backoff(retry_state) -> float:
+    delay = retry_after(retry_state.outcome.exception())
+    return delay if delay is not None else _jitter(retry_state)
+
+
+class CircuitBreaker:
+    """Opens after `failures` consecutive failed calls; after `reset_seconds` one trial
+    call is let through (half-open) and a success closes it again."""
+
+    def __init__(self, failures: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.failures = max(1, failures)
+        self.reset_seconds = reset_seconds
+        self._count = 0
+        self._opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self._count, self._opened_at, self._trial = 0, None, False
+
+    def failure(self):
+        with self._lock:
+            self._count += 1
+            self._trial = False
+            if self._count >= self.failures or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+class ProviderLimiter:
+    """Concurrency, requests/min and tokens/min limits of one provider/model.
+
+    A call reserves its prompt tokens plus max_tokens up front and gets the
+    unused part back once the reply (or the end of a stream) reports its usage.
+    """
+
+    def __init__(self, concurrency: int, requests_per_min: Optional[float], tokens_per_min: Optional[float]):
+        self.gate = ConcurrencyGate(concurrency, requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min / 60.0, tokens_per_min) if tokens_per_min else None
+
+    def take_tokens(self, amount: int) -> int:
+        if self.tokens is None:
+            return 0
+        self.tokens.acquire(amount)
+        return min(amount, int(self.tokens.capacity))
+
+    def settle(self, reserved: int, used: Optional[int]):
+        if self.tokens is not None and used is not None:
+            self.tokens.refund(reserved - used)
+
+
+# One limiter per provider/model and one breaker per provider for the whole process, so every
+# client (batch jobs, server requests) shares the provider's quota and health
+_limiters: Dict[tuple, ProviderLimiter] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def provider_limiter(provider: str, model: str) -> ProviderLimiter:
+    with _registry_lock:
+        limiter = _limiters.get((provider, model))
+        if limiter is None:
+            concurrency, rate_per_min = PROVIDER_LIMITS.get(provider, (4, None))
+            limiter = _limiters[(provider, model)] = ProviderLimiter(
+                concurrency, rate_per_min, PROVIDER_TOKEN_LIMITS.get(provider))
+        return limiter
+
+
+def provider_breaker(provider: str) -> CircuitBreaker:
+    with _registry_lock:
+        return _breakers.setdefault(provider, CircuitBreaker())
+
+
+def model_name(llm: Any) -> str:
+    return str(getattr(llm, "model", None) or getattr(llm, "model_name", None) or "")
+
+
+def _used_tokens(result: Any) -> Optional[int]:
+    generations = getattr(result, "generations", None)
+    if not generations:
+        return None
+    usage = getattr(generations[0].message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+# Providers other than the primary that served calls inside `track_fallbacks()`
+_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("llm_fallbacks", default=None)
+
+
+@contextmanager
+def track_fallbacks():
+    """Yields a list that collects the backup providers serving LLM calls made in the block,
+    so callers can tell a reply came from another model than the one they asked for."""
+    previous = _fallbacks.get()
+    served: List[str] = []
+    _fallbacks.set(served)
+    try:
+        yield served
+    finally:
+        # set() rather than reset(): a generator may close the block from another context
+        _fallbacks.set(previous)
+
+
+class Route:
+    """One provider behind the client; its chat model is created on first use."""
+
+    def __init__(self, provider: str, factory: Callable[[], BaseChatModel], llm: Optional[BaseChatModel] = None):
+        self.provider = provider
+        self.factory = factory
+        self.breaker = provider_breaker(provider)
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_wait = 0.0
+        self._llm = llm
+        self._limiter: Optional[ProviderLimiter] = None
+        self._lock = threading.Lock()
+
+    @property
+    def llm(self) -> BaseChatModel:
+        with self._lock:
+            if self._llm is None:
+                self._llm = self.factory()
+            return self._llm
+
+    @property
+    def limiter(self) -> ProviderLimiter:
+        if self._limiter is None:
+            self._limiter = provider_limiter(self.provider, model_name(self.llm))
+        return self._limiter
+
+    def messages(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """Content blocks (e.g. Anthropic cache_control) flattened to text for other providers."""
+        if self.provider == "anthropic":
+            return messages
+        return [m.model_copy(update={"content": message_text(m)}) if isinstance(m.content, list) else m
+                for m in messages]
+
+    def reserve(self, messages: List[BaseMessage], max_tokens: Optional[int]) -> int:
+        """Wait for this provider's token budget (call with the gate held)."""
+        started = time.perf_counter()
+        estimate = sum(count_tokens(message_text(m)) for m in messages) + (max_tokens or LLM_MAX_OUTPUT_TOKENS)
+        reserved = self.limiter.take_tokens(estimate)
+        self.calls += 1
+        self.rate_wait += time.perf_counter() - started
+        return reserved
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "retries": self.retries, "failures": self.failures,
+                "rate_wait_seconds": self.rate_wait, "circuit": self.breaker.state}
+
+
+class ResilientChatModel(BaseChatModel):
+    """Chat model that sends each call to the first healthy provider of `routes`.
+
+    Every attempt waits for the provider's concurrency, request and token
+    limits. Transient errors (429, 5xx, timeouts) are retried with jittered
+    exponential backoff, or after the provider's Retry-After; when a provider
+    keeps failing the call moves to the next route, and its circuit breaker
+    takes it out of rotation for a while. A stream is retried only until its
+    first chunk arrives and holds its concurrency slot until it is exhausted.
+    """
+
+    routes: List[Any] = Field(default_factory=list, exclude=True)
+    model: str = ""
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
+    retries: int = LLM_RETRIES
+
+    @classmethod
+    def for_providers(cls, primary: BaseChatModel, provider: str,
+                      backups: Sequence[tuple] = ()) -> "ResilientChatModel":
+        """`backups` are (provider name, factory) pairs, tried in order after `provider`."""
+        routes = [Route(provider, lambda: primary, llm=primary)]
+        routes += [Route(name, factory) for name, factory in backups]
+        return cls(routes=routes, model=model_name(primary), temperature=getattr(primary, "temperature", None),
+                   max_tokens=getattr(primary, "max_tokens", None))
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"providers": [r.provider for r in self.routes], "model": self.model}
+
+    def stats(self) -> Dict[str, dict]:
+        return {route.provider: route.stats() for route in self.routes}
+
+    def _retrying(self, route: Route, retrying_cls=Retrying):
+        def count_retry(retry_state):
+            route.retries += 1
+        return retrying_cls(stop=stop_after_attempt(self.retries + 1), wait=_backoff,
+                            retry=retry_if_exception(_should_retry), before_sleep=count_retry, reraise=True)
+
+    def _max_tokens(self, kwargs: dict) -> Optional[int]:
+        if self.max_tokens is not None:
+            kwargs.setdefault("max_tokens", self.max_tokens)
+        return kwargs.get("max_tokens")
+
+    def _call(self, messages: List[BaseMessage], max_tokens: Optional[int],
+              fn: Callable[[BaseChatModel, List[BaseMessage]], Any], routes: Optional[List[Route]] = None,
+              hold: bool = False):
+        """`fn(llm, messages)` on the first route that succeeds, with limits and retries.
+
+        With `hold` the route's concurrency slot stays taken and `(route, reserved tokens,
+        result)` is returned; the caller releases it with `_release` (used for streams).
+        """
+        last_error: Optional[BaseException] = None
+        for route in routes or self.routes:
+            if not route.breaker.allow():
+                continue
+            try:
+                route.limiter  # creates the provider's model on first use
+            except Exception as e:
+                last_error = self._failed(route, e)
+                continue
+
+            def attempt():
+                route.limiter.gate.__enter__()
+                try:
+                    reserved = route.reserve(messages, max_tokens)
+                    result = fn(route.llm, route.messages(messages))
+                except BaseException:
+                    route.limiter.gate.__exit__(None, None, None)
+                    raise
+                if hold:
+                    return route, reserved, result
+                self._release(route, reserved, _used_tokens(result))
+                return result
+
+            try:
+                result = self._retrying(route)(attempt)
+            except Exception as e:
+                if error_action(e) == "raise":
+                    route.breaker.success()  # the provider answered; the request itself is at fault
+                    raise
+                last_error = self._failed(route, e)
+                continue
+            if not hold:
+                route.breaker.success()
+            self._served(route)
+            return result
+        raise RuntimeError(f"All LLM providers failed or are unavailable: {last_error}") from last_error
+
+    async def _acall(self, messages: List[BaseMessage], max_tokens: Optional[int],
+                     fn: Callable[[BaseChatModel, List[BaseMessage]], Any], routes: Optional[List[Route]] = None,
+                     hold: bool = False):
+        """Async `_call`; `fn` returns an awaitable."""
+        last_error: Optional[BaseException] = None
+        for route in routes or self.routes:
+            if not route.breaker.allow():
+                continue
+            try:
+                route.limiter
+            except Exception as e:
+                last_error = self._failed(route, e)
+                continue
+
+            async def attempt():
+                await route.limiter.gate.__aenter__()
+                try:
+                    reserved = await asyncio.to_thread(route.reserve, messages, max_tokens)
+                    result = await fn(route.llm, route.messages(messages))
+                except BaseException:
+                    route.limiter.gate.__exit__(None, None, None)
+                    raise
+                if hold:
+                    return route, reserved, result
+                self._release(route, reserved, _used_tokens(result))
+                return result
+
+            try:
+                result = await self._retrying(route, AsyncRetrying)(attempt)
+            except Exception as e:
+                if error_action(e) == "raise":
+                    route.breaker.success()
+                    raise
+                last_error = self._failed(route, e)
+                continue
+            if not hold:
+                route.breaker.success()
+            self._served(route)
+            return result
+        raise RuntimeError(f"All LLM providers failed or are unavailable: {last_error}") from last_error
+
+    @staticmethod
+    def _release(route: Route, reserved: int, used: Optional[int]):
+        """Free the route's concurrency slot and return the unused token reservation."""
+        route.limiter.gate.__exit__(None, None, None)
+        route.limiter.settle(reserved, used)
+
+    def _served(self, route: Route):
+        served = _fallbacks.get()
+        if served is not None and route is not self.routes[0]:
+            served.append(route.provider)
+
+    @staticmethod
+    def _stream_done(route: Route, error: Optional[BaseException]):
+        """Report a finished stream to the breaker. Chunks were already passed on, so an
+        error mid-stream cannot move the call to another route."""
+        if error is not None and error_action(error) != "raise":
+            route.failures += 1
+            route.breaker.failure()
+        else:
+            route.breaker.success()
+
+    @staticmethod
+    def _failed(route: Route, error: BaseException) -> BaseException:
+        route.failures += 1
+        route.breaker.failure()
+        print(f"LLM provider '{route.provider}' failed ({type(error).__name__}: {error}); trying the next one.")
+        return error
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        max_tokens = self._max_tokens(kwargs)
+        return self._call(messages, max_tokens, lambda llm, msgs: llm._generate(msgs, stop=stop, **kwargs))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        max_tokens = self._max_tokens(kwargs)
+        return await self._acall(messages, max_tokens, lambda llm, msgs: llm._agenerate(msgs, stop=stop, **kwargs))
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        max_tokens = self._max_tokens(kwargs)
+
+        def start(llm, msgs):
+            # Errors (429, connection) surface on the first chunk; later ones cannot be retried
+            chunks = llm._stream(msgs, stop=stop, **kwargs)
+            return next(chunks, None), chunks
+
+        route, reserved, (first, chunks) = self._call(messages, max_tokens, start, hold=True)
+        usage, error = None, None
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                usage = add_usage(usage, chunk.message.usage_metadata) if chunk.message.usage_metadata else usage
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._stream_done(route, error)
+            self._release(route, reserved, usage["total_tokens"] if usage else None)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        max_tokens = self._max_tokens(kwargs)
+
+        async def start(llm, msgs):
+            chunks = llm._astream(msgs, stop=stop, **kwargs)
+            try:
+                return await chunks.__anext__(), chunks
+            except StopAsyncIteration:
+                return None, chunks
+
+        route, reserved, (first, chunks) = await self._acall(messages, max_tokens, start, hold=True)
+        usage, error = None, None
+
+        async def rest():
+            if first is not None:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+
+        try:
+            async for chunk in rest():
+                usage = add_usage(usage, chunk.message.usage_metadata) if chunk.message.usage_metadata else usage
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._stream_done(route, error)
+            self._release(route, reserved, usage["total_tokens"] if usage else None)
+
+    def with_structured_output(self, schema, **kwargs):
+        """Structured output through the routes whose providers support it natively."""
+        routes = [r for r in self.routes if r.provider in STRUCTURED_OUTPUT_PROVIDERS] or self.routes[:1]
+        max_tokens = self.max_tokens
+
+        def structured(llm):
+            if max_tokens is not None:
+                llm = llm.model_copy(update={"max_tokens": max_tokens})
+            return llm.with_structured_output(schema, **kwargs)
+
+        def invoke(input, config=None):
+            messages = self._convert_input(input).to_messages()
+            return self._call(messages, max_tokens, lambda llm, msgs: structured(llm).invoke(msgs, config=config),
+                              routes)
+
+        async def ainvoke(input, config=None):
+            messages = self._convert_input(input).to_messages()
+            return await self._acall(messages, max_tokens,
+                                     lambda llm, msgs: structured(llm).ainvoke(msgs, config=config), routes)
+
+        return RunnableLambda(invoke, afunc=ainvoke)
@@ -1,57 +1,162 @@
-from typing import List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
 import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser, JsonOutputParser
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_cohere import ChatCohere
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
-from src.rag.groq_wrapper import ChatGroq
+from src.rag.providers import make_llm
+from src.rag.llm_client import ResilientChatModel, track_fallbacks
+from src.rag import ann_index
+from src.rag.index_store import IndexStore, document_id
+from src.rag.embedding_cache import CachedEmbeddings
+from src.rag.embedding_engine import EmbeddingEngine
+from src.rag.chunking import DocumentChunker
+from src.rag.llm_cache import LLMResponseCache
+from src.rag.retrieval_cache import RetrievalCache
+from src.rag.hybrid import HybridSearcher, get_reranker, identifiers
+from src.rag.context_assembly import ContextAssembler
+from src.rag.usage import UsageTracker
+from src.rag.json_stream import JsonItemStream
+from src.rag.output_parsing import (
+    CASE_KEYS, coerce_bundle_parts, coerce_to_schema, item_keys, parse_json_response, validate_item,
+)
+from src.rag.continuation import continuation_messages, is_truncated, output_token_budget, strip_leading_fence
 
+from src.utils.text_clean import normalize_text
 from src.models.schemas import TestPlan, TestScenario, TestCase, GenerationBundle
-from src.prompts.templates import SYSTEM_DIRECTIVE, PLAN_INSTRUCTIONS, SCENARIO_INSTRUCTIONS, CASE_INSTRUCTIONS
+from src.prompts.templates import (
+    SYSTEM_DIRECTIVE, PLAN_INSTRUCTIONS, SCENARIO_INSTRUCTIONS, CASE_INSTRUCTIONS, REQUIREMENT_CASE_INSTRUCTIONS,
+    BUNDLE_INSTRUCTIONS,
+)
 from src.config import (
     MODEL_PROVIDER,
-    OPENAI_API_KEY, OPENAI_MODEL,
-    ANTHROPIC_API_KEY, ANTHROPIC_MODEL,
-    GROQ_API_KEY, GROQ_MODEL,
-    COHERE_API_KEY, COHERE_MODEL,
     DEFAULT_EMBED_MODEL,
+    INDEX_DIR, INDEX_KIND,
+    EMBED_CACHE_DIR, EMBED_CACHE_MAX_ENTRIES,
+    EMBED_BATCH_SIZE, EMBED_PROCESSES, EMBED_THREADS,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES,
+    RETRIEVAL_K, RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_THRESHOLD,
+    RETRIEVAL_MODE, RERANK_MODEL,
+    LLM_MAX_CONTINUATIONS,
+    PROMPT_CACHE, PROMPT_CACHE_PROVIDERS,
 )
 
 class RAGTestGenerator:
-    def __init__(self, docs: List[Document]):
+    def __init__(self, docs: List[Document], index_name: Optional[str] = None, index_dir: str = INDEX_DIR,
+                 embed_cache_dir: Optional[str] = EMBED_CACHE_DIR,
+                 chunk_tokens: int = CHUNK_MAX_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+                 removed_ids: Optional[List[str]] = None, llm_cache_path: Optional[str] = LLM_CACHE_PATH,
+                 embeddings=None, llm=None,
+                 llm_cache: Optional[LLMResponseCache] = None, index_kind: str = INDEX_KIND,
+                 retrieval_mode: str = RETRIEVAL_MODE, rerank_model: Optional[str] = RERANK_MODEL,
+                 context_tokens: Optional[int] = None):
+        """`embeddings`, `llm` and `llm_cache` let long-lived callers (batch runs)
+        share warm resources between generators instead of loading them per run."""
         self.docs = docs
-        self.embeddings = HuggingFaceEmbeddings(model_name=DEFAULT_EMBED_MODEL)
-        self.vs = FAISS.from_documents(docs, self.embeddings)
-        self.retriever = self.vs.as_retriever(search_kwargs={"k": 6})
-        self.llm = None
+        # One document per issue/file is too coarse to retrieve; index token-bounded chunks instead
+        self.chunks = DocumentChunker(chunk_tokens, chunk_overlap).split(docs) if chunk_tokens else docs
+        self.embeddings = embeddings or make_embeddings(embed_cache_dir)
+        self.store = None
+        if index_name:
+            # Persistent index: only new/changed documents get embedded
+            self.store = IndexStore(Path(index_dir) / index_name, self.embeddings, DEFAULT_EMBED_MODEL,
+                                    index_kind=index_kind)
+            if removed_ids is None:
+                result = self.store.sync(self.chunks)
+            else:
+                # `docs` is a change set: upsert it and drop `removed_ids`, keep everything else
+                result = self.store.upsert(self.chunks, removed_ids)
+            print(f"Index '{index_name}': {result.summary()}")
+            self.vs = self.store.vectorstore
+        else:
+            self.vs = ann_index.build_vectorstore(self.chunks, self.embeddings, index_kind)
+        self.retriever = self.vs.as_retriever(search_kwargs={"k": RETRIEVAL_K})
+        self.retrieval_cache = RetrievalCache(RETRIEVAL_CACHE_SIZE, RETRIEVAL_CACHE_THRESHOLD)
+        if retrieval_mode not in ("dense", "hybrid"):
+            raise ValueError(f"Unknown retrieval mode '{retrieval_mode}'; expected dense or hybrid")
+        self.retrieval_mode = retrieval_mode
+        self.hybrid = None
+        if retrieval_mode == "hybrid":
+            self.hybrid = HybridSearcher(self.vs, reranker=get_reranker(rerank_model) if rerank_model else None)
+        # Budget defaults to the provider's (see PROVIDER_CONTEXT)
+        self.context_assembler = ContextAssembler(context_tokens)
+        self.usage = UsageTracker()
+        self.llm = llm
+        self.llm_cache = llm_cache
+        if llm_cache is None and llm_cache_path:
+            self.llm_cache = LLMResponseCache(llm_cache_path, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                                              max_entries=LLM_CACHE_MAX_ENTRIES)
+
+    def embedding_engine_stats(self) -> Optional[dict]:
+        engine = self.embeddings.embedder if isinstance(self.embeddings, CachedEmbeddings) else self.embeddings
+        return engine.stats() if isinstance(engine, EmbeddingEngine) else None
+
+    def embedding_cache_stats(self) -> Optional[dict]:
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.stats()
+        return None
+
+    def llm_cache_stats(self) -> Optional[dict]:
+        return self.llm_cache.stats() if self.llm_cache else None
+
+    def retrieval_cache_stats(self) -> dict:
+        return self.retrieval_cache.stats()
+
+    def context_stats(self) -> dict:
+        return self.context_assembler.stats()
+
+    def usage_stats(self) -> dict:
+        return self.usage.stats()
+
+    def llm_client_stats(self) -> Optional[Dict[str, dict]]:
+        """Calls, retries and failures per provider of the resilient client (None for a bare model)."""
+        return self.llm.stats() if isinstance(self.llm, ResilientChatModel) else None
+
+    def index_report(self, k: int = 10, n_queries: int = 200) -> dict:
+        """Recall@k and query latency of the vector index against exact search over the same vectors."""
+        return ann_index.compare_to_exact(self.vs.index, ann_index.stored_vectors(self.vs, self.embeddings),
+                                          k=k, n_queries=n_queries)
 
     def _make_llm(self):
-        print(f"Using model provider: {MODEL_PROVIDER}")
-        if MODEL_PROVIDER == "groq" and GROQ_API_KEY:
-            return ChatGroq(api_key=GROQ_API_KEY, model=GROQ_MODEL, temperature=0.2)
-        elif MODEL_PROVIDER == "cohere" and COHERE_API_KEY:
-            return ChatCohere(cohere_api_key=COHERE_API_KEY, model=COHERE_MODEL, temperature=0.2)
-        elif MODEL_PROVIDER == "openai" and OPENAI_API_KEY:
-            return ChatOpenAI(api_key=OPENAI_API_KEY, model=OPENAI_MODEL, temperature=0.2)
-        elif MODEL_PROVIDER == "anthropic" and ANTHROPIC_API_KEY:
-            return ChatAnthropic(api_key=ANTHROPIC_API_KEY, model=ANTHROPIC_MODEL, temperature=0.2)
-        else:
-            raise RuntimeError(f"No LLM provider configured for '{MODEL_PROVIDER}'. Set env vars: GROQ_API_KEY, COHERE_API_KEY, OPENAI_API_KEY, or ANTHROPIC_API_KEY.")
+        return make_llm()
 
-    def _context_from_query(self, query: str) -> str:
-        """Retrieve and join contexts for prompt."""
-        docs = self.retriever.invoke(query)
-        joined = "\n\n".join([d.page_content for d in docs])
-        return joined
+    def _llm_config(self) -> dict:
+        # Passed per call rather than set on the (possibly shared) model, so usage is per generator
+        return {"callbacks": [self.usage]}
 
-    def _chain_structured(self, schema: BaseModel, system: str, task: str):
+    @property
+    def index_version(self):
+        # In-memory indexes never change after construction; persistent ones bump on every write
+        return self.store.version if self.store else id(self.vs)
+
+    def retrieve(self, query: str, k: int = RETRIEVAL_K, filters: Optional[dict] = None) -> List[Document]:
+        """Dense or hybrid search, served from the semantic retrieval cache when a near-identical query was seen."""
+        query_vector = self.embeddings.embed_query(query)
+        mode = self.retrieval_mode
+        if self.hybrid is not None:
+            # Near-identical embeddings can differ in the one identifier BM25 is there to match
+            mode = "hybrid:" + " ".join(identifiers(query))
+        docs = self.retrieval_cache.get(self.index_version, query_vector, k, filters, mode=mode)
+        if docs is None:
+            if self.hybrid is not None:
+                docs = self.hybrid.search(query, query_vector, k, filters)
+            else:
+                docs = self.vs.similarity_search_by_vector(query_vector, k=k, filter=filters)
+            self.retrieval_cache.put(self.index_version, query_vector, k, filters, docs, mode=mode)
+        return docs
+
+    def _context_from_query(self, query: str, k: int = RETRIEVAL_K, filters: Optional[dict] = None) -> str:
+        """Retrieve and pack contexts for prompt (token budget, de-duplicated, by relevance)."""
+        docs = self.retrieve(query, k=k, filters=filters)
+        return self.context_assembler.assemble(docs).text
+
+    def _structured_prompt(self, schema: BaseModel, system: str, task: str) -> ChatPromptTemplate:
         if self.llm is None:
             self.llm = self._make_llm()
         
@@ -64,277 +169,381 @@ class RAGTestGenerator:
             schema_json = {"type": "array", "items": "objects"}
             schema_name = str(schema)
         
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system),
-            ("human", f"Context:\n{{context}}\n\nTask:\n{task}\n\nReturn ONLY valid JSON matching the schema. Do not wrap in markdown. Output pure JSON only."),
-        ])
+        # Directive + context first: identical for every chain of a run, so providers with prompt
+        # caching reuse it after the first call. Only the task message differs between chains.
+        prefix = f"{system}\n\nContext:\n{{context}}"
+        human = f"Task:\n{task}\n\nReturn ONLY valid JSON matching the schema. Do not wrap in markdown. Output pure JSON only."
+        if PROMPT_CACHE and MODEL_PROVIDER == "anthropic":
+            # Anthropic only caches up to an explicit breakpoint
+            prefix = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+        return ChatPromptTemplate.from_messages([("system", prefix), ("human", human)])
+
+    def _chain_structured(self, schema: BaseModel, system: str, task: str):
+        prompt = self._structured_prompt(schema, system, task)
         
         # OpenAI and Anthropic support structured output; Groq/Cohere need JSON parsing
         if MODEL_PROVIDER in ["openai", "anthropic"]:
-            return prompt | self.llm.with_structured_output(schema)
+            return prompt | self._cached(self._structured_llm(schema), schema)
         else:
             # Groq/Cohere: parse JSON response and handle markdown code blocks
-            def parse_json_response(text: str):
-                import re
-                
-                # Step 1: Remove markdown code blocks if present
-                if "```json" in text:
-                    start = text.find("```json") + 7
-                    end = text.rfind("```")
-                    if end > start:
-                        text = text[start:end].strip()
-                elif "```" in text:
-                    start = text.find("```") + 3
-                    end = text.rfind("```")
-                    if end > start:
-                        text = text[start:end].strip()
-                
-                # Step 2: Extract raw JSON from text (find first { or [ and match closing bracket)
-                text = text.strip()
-                if not text.startswith("{") and not text.startswith("["):
-                    # Find first { or [
-                    brace_idx = text.find("{")
-                    bracket_idx = text.find("[")
-                    indices = [i for i in [brace_idx, bracket_idx] if i != -1]
-                    if indices:
-                        json_start = min(indices)
-                        text = text[json_start:]
-                
-                # Step 3: Extract complete JSON by matching brackets
-                def extract_json_object(s):
-                    """Extract a complete JSON object/array from text"""
-                    if not s or s[0] not in ['{', '[']:
-                        return None
-                    
-                    stack = []
-                    in_string = False
-                    escape_next = False
-                    start_char = s[0]
-                    end_char = '}' if start_char == '{' else ']'
-                    
-                    for i, char in enumerate(s):
-                        if escape_next:
-                            escape_next = False
-                            continue
-                        
-                        if char == '\\' and in_string:
-                            escape_next = True
-                            continue
-                        
-                        if char == '"' and not escape_next:
-                            in_string = not in_string
-                            continue
-                        
-                        if not in_string:
-                            if char in ['{', '[']:
-                                stack.append(char)
-                            elif char in ['}', ']']:
-                                stack.pop()
-                                if not stack:
-                                    return s[:i+1]
-                    
-                    return None
-                
-                json_str = extract_json_object(text)
-                if not json_str:
-                    json_str = text
-                
-                # Step 4: Fix common JSON issues
-                # Remove trailing commas
-                json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-                
-                # Step 5: Try to parse JSON with error recovery
-                data = None
-                try:
-                    data = json.loads(json_str)
-                except json.JSONDecodeError as e:
-                    # Handle unterminated strings and other JSON errors
-                    if e.pos is not None:
-                        # For unterminated string errors, try to find the last complete object
-                        if "Unterminated string" in str(e) or "unterminated" in str(e).lower():
-                            # Find the last complete item in array or object
-                            truncated = json_str[:e.pos]
-                            
-                            # If we're in an array, find the last complete object before the error
-                            if json_str.strip().startswith('['):
-                                # Find the last complete object by looking for '},\n' or '},'
-                                last_complete = truncated.rfind('},')
-                                if last_complete == -1:
-                                    last_complete = truncated.rfind('}')
-                                if last_complete != -1:
-                                    truncated = truncated[:last_complete + 1]
-                            
-                            # Close the string if we're inside quotes
-                            if truncated.count('"') % 2 != 0:
-                                truncated = truncated.rstrip() + '"'
-                        else:
-                            # For other errors, just truncate at error position
-                            truncated = json_str[:e.pos]
-                        
-                        # Remove trailing commas
-                        truncated = truncated.rstrip(',').rstrip()
-                        
-                        # Close any open brackets/braces
-                        open_braces = truncated.count('{') - truncated.count('}')
-                        open_brackets = truncated.count('[') - truncated.count(']')
-                        truncated = truncated + ']' * open_brackets + '}' * open_braces
-                        
-                        try:
-                            data = json.loads(truncated)
-                        except Exception as truncate_err:
-                            # Last resort: try to extract just the valid items from the array
-                            if json_str.strip().startswith('['):
-                                # Find all complete objects in the array
-                                valid_items = []
-                                depth = 0
-                                current_obj = ""
-                                in_string = False
-                                escape_next = False
-                                
-                                for char in json_str[1:]:  # Skip opening [
-                                    if escape_next:
-                                        current_obj += char
-                                        escape_next = False
-                                        continue
-                                    if char == '\\' and in_string:
-                                        escape_next = True
-                                        current_obj += char
-                                        continue
-                                    if char == '"' and not escape_next:
-                                        in_string = not in_string
-                                    
-                                    current_obj += char
-                                    
-                                    if not in_string:
-                                        if char == '{':
-                                            depth += 1
-                                        elif char == '}':
-                                            depth -= 1
-                                            if depth == 0:
-                                                # Complete object found
-                                                try:
-                                                    obj = json.loads(current_obj.strip())
-                                                    valid_items.append(obj)
-                                                    current_obj = ""
-                                                except:
-                                                    pass
-                                
-                                if valid_items:
-                                    data = valid_items
-                                else:
-                                    raise ValueError(f"Failed to parse JSON. Error: {e}")
-                            else:
-                                raise ValueError(f"Failed to parse JSON. Error: {e}")
-                    else:
-                        raise ValueError(f"Failed to parse JSON. Error: {e}")
-                
-                # Step 6: Extract data for specific schema
-                schema_name = str(schema)
-                if hasattr(schema, '__name__'):
-                    schema_name = schema.__name__
-                
-                # Check for List[Type] pattern
-                if 'List' in schema_name and hasattr(schema, '__args__'):
-                    try:
-                        inner_type = schema.__args__[0]
-                        inner_name = inner_type.__name__ if hasattr(inner_type, '__name__') else str(inner_type)
-                        schema_name = f"List[{inner_name}]"
-                    except:
-                        pass
-                
-                # For TestPlan schema
-                if 'TestPlan' in schema_name:
-                    if isinstance(data, dict):
-                        # Look for testPlan key
-                        if 'testPlan' in data:
-                            data = data['testPlan']
-                        elif 'test_plan' in data:
-                            data = data['test_plan']
-                        # Remove other keys if present
-                        for unwanted_key in ['testScenarios', 'test_scenarios', 'testCases', 'test_cases']:
-                            data.pop(unwanted_key, None)
-                    return schema.model_validate(data)
-                
-                # For TestScenario list
-                elif 'TestScenario' in schema_name:
-                    if isinstance(data, dict):
-                        # Look for testScenarios/scenarios key
-                        for key in ['testScenarios', 'test_scenarios', 'scenarios', 'testScenarios']:
-                            if key in data:
-                                data = data[key]
-                                break
-                        # If still dict but has list inside, find it
-                        if isinstance(data, dict):
-                            for key, value in data.items():
-                                if isinstance(value, list) and len(value) > 0:
-                                    if isinstance(value[0], dict) and ('id' in value[0] or 'description' in value[0]):
-                                        data = value
-                                        break
-                    
-                    if hasattr(schema, '__args__'):
-                        inner_type = schema.__args__[0]
-                        if isinstance(data, list):
-                            # Remove testCases from each scenario
-                            for item in data:
-                                if isinstance(item, dict):
-                                    item.pop('testCases', None)
-                                    item.pop('test_cases', None)
-                                    item.pop('cases', None)
-                            return [inner_type.model_validate(item) for item in data]
-                    return data
-                
-                # For TestCase list (MOST IMPORTANT - separate from scenarios)
-                elif 'TestCase' in schema_name:
-                    if isinstance(data, dict):
-                        # First, remove scenario-related keys
-                        data.pop('testPlan', None)
-                        data.pop('test_plan', None)
-                        data.pop('testScenarios', None)
-                        data.pop('test_scenarios', None)
-                        data.pop('scenarios', None)
-                        
-                        # Look for testCases/cases key
-                        cases_data = None
-                        for key in ['testCases', 'test_cases', 'cases', 'testcases']:
-                            if key in data:
-                                cases_data = data[key]
-                                break
-                        
-                        if cases_data is not None:
-                            data = cases_data
-                        elif isinstance(data, dict) and len(data) > 0:
-                            # If still dict but has list inside, find it
-                            for key, value in data.items():
-                                if isinstance(value, list):
-                                    if len(value) > 0:
-                                        # Check if items look like test cases
-                                        if isinstance(value[0], dict) and any(k in value[0] for k in ['id', 'title', 'objective', 'steps', 'testCaseId']):
-                                            data = value
-                                            break
-                    
-                    if hasattr(schema, '__args__'):
-                        inner_type = schema.__args__[0]
-                        if isinstance(data, list):
-                            return [inner_type.model_validate(item) for item in data]
-                        elif isinstance(data, dict) and len(data) == 0:
-                            return []
-                    return data if isinstance(data, list) else ([] if isinstance(data, dict) and len(data) == 0 else data)
-                
-                # Default handling
-                return schema.model_validate(data) if hasattr(schema, 'model_validate') else data
-            
-            return prompt | self.llm | StrOutputParser() | parse_json_response
-
-    def generate_all(self, query: Optional[str] = None) -> GenerationBundle:
-        q = query or "Generate QA assets from given requirements"
-        context = self._context_from_query(q)
+            parse = RunnableLambda(lambda text: parse_json_response(text, schema))
+            return prompt | self._cached(self._text_llm(schema), schema, raw_text=True) | parse
+
+    def _structured_llm(self, schema):
+        """Structured-output call with max_tokens sized from the prompt. A cut-off tool call
+        cannot be continued, so the budget is the only lever here."""
+        def sized(prompt_value):
+            budget = output_token_budget(schema, prompt_value.to_messages())
+            return self.llm.model_copy(update={"max_tokens": budget}).with_structured_output(schema)
+
+        def invoke(prompt_value):
+            return sized(prompt_value).invoke(prompt_value, config=self._llm_config())
+
+        async def ainvoke(prompt_value):
+            return await sized(prompt_value).ainvoke(prompt_value, config=self._llm_config())
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+    def _text_llm(self, schema):
+        """Raw-text call with max_tokens sized from the prompt; replies cut off at the
+        limit are continued in follow-up calls and joined."""
+        def invoke(prompt_value):
+            messages = prompt_value.to_messages()
+            budget = output_token_budget(schema, messages)
+            text = ""
+            for attempt in range(LLM_MAX_CONTINUATIONS + 1):
+                reply = self.llm.invoke(continuation_messages(messages, text) if attempt else messages,
+                                        config=self._llm_config(), max_tokens=budget)
+                text += strip_leading_fence(reply.content) if attempt else reply.content
+                if not is_truncated(reply):
+                    return text
+            print(f"Reply still truncated after {LLM_MAX_CONTINUATIONS} continuations; keeping complete items only.")
+            return text
+
+        async def ainvoke(prompt_value):
+            messages = prompt_value.to_messages()
+            budget = output_token_budget(schema, messages)
+            text = ""
+            for attempt in range(LLM_MAX_CONTINUATIONS + 1):
+                reply = await self.llm.ainvoke(continuation_messages(messages, text) if attempt else messages,
+                                               config=self._llm_config(), max_tokens=budget)
+                text += strip_leading_fence(reply.content) if attempt else reply.content
+                if not is_truncated(reply):
+                    return text
+            print(f"Reply still truncated after {LLM_MAX_CONTINUATIONS} continuations; keeping complete items only.")
+            return text
+
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+    def _stream_text(self, schema, messages) -> Iterator[str]:
+        """Streaming counterpart of `_text_llm`: yields text chunks, continuing across truncations."""
+        budget = output_token_budget(schema, messages)
+        text = ""
+        for attempt in range(LLM_MAX_CONTINUATIONS + 1):
+            truncated = False
+            head = "" if attempt else None  # start of a continuation, held back until a fence can be seen
+            for chunk in self.llm.stream(continuation_messages(messages, text) if attempt else messages,
+                                         config=self._llm_config(), max_tokens=budget):
+                truncated = truncated or is_truncated(chunk)
+                piece = chunk.content if isinstance(chunk.content, str) else ""
+                if head is not None:
+                    head += piece
+                    if len(head.lstrip()) < 8:
+                        continue
+                    piece, head = strip_leading_fence(head), None
+                text += piece
+                yield piece
+            if head:
+                piece = strip_leading_fence(head)
+                text += piece
+                yield piece
+            if not truncated:
+                return
+        print(f"Reply still truncated after {LLM_MAX_CONTINUATIONS} continuations; keeping complete items only.")
+
+    def _stream_structured(self, schema, system: str, task: str, inputs: dict, on_item: Callable[[Any], None]):
+        """Like `_chain_structured(...).invoke(inputs)` for a List[...] schema, but calls
+        `on_item` with every validated item as soon as the model has finished it.
+
+        Groq/Cohere output is streamed through an incremental JSON parser;
+        providers with structured output deliver the items after the call
+        returns. Items that fail validation are skipped here and surface in
+        the final result as they would without streaming.
+        """
+        if MODEL_PROVIDER in ["openai", "anthropic"]:
+            result = self._chain_structured(schema, system, task).invoke(inputs)
+            for item in result:
+                on_item(item)
+            return result
+
+        prompt_value = self._structured_prompt(schema, system, task).invoke(inputs)
+        stream = JsonItemStream(item_keys(schema))
+        for item in self._stream_json(schema, prompt_value, stream):
+            try:
+                on_item(validate_item(item, schema))
+            except ValidationError:
+                pass
+        return coerce_to_schema(stream.result(), schema)
+
+    def _stream_json(self, schema, prompt_value, stream: JsonItemStream) -> Iterator[Any]:
+        """Feed the raw reply (from the response cache, else streamed) to `stream` and
+        yield its items as they complete."""
+        key = self._cache_key(prompt_value, schema) if self.llm_cache else None
+        cached = self.llm_cache.get(key) if key else None
+        chunks = [cached] if cached is not None else self._stream_text(schema, prompt_value.to_messages())
+        text = []
+        with track_fallbacks() as fallbacks:
+            for chunk in chunks:
+                text.append(chunk)
+                yield from stream.feed(chunk)
+        # A backup provider's reply would be served later as if the primary model had written it
+        if key and cached is None and not fallbacks:
+            self.llm_cache.put(key, "".join(text))
+
+    def _cached(self, runnable, schema, raw_text: bool = False):
+        """Wrap the LLM step of a chain with the persistent response cache.
+
+        Text responses are cached verbatim (so JSON parsing changes apply
+        without new LLM calls); structured responses are cached as JSON and
+        re-validated against `schema`.
+        """
+        if self.llm_cache is None:
+            return runnable
+        cache = self.llm_cache
+        adapter = None if raw_text else TypeAdapter(schema)
+
+        def key_for(prompt_value) -> str:
+            return self._cache_key(prompt_value, schema)
+
+        def decode(value: str):
+            return value if raw_text else adapter.validate_json(value)
+
+        def encode(result) -> str:
+            return result if raw_text else adapter.dump_json(result, by_alias=True).decode("utf-8")
+
+        def invoke(prompt_value):
+            key = key_for(prompt_value)
+            hit = cache.get(key)
+            if hit is not None:
+                return decode(hit)
+            with track_fallbacks() as fallbacks:
+                result = runnable.invoke(prompt_value)
+            if not fallbacks:  # keyed on the primary model; don't store a backup provider's reply
+                cache.put(key, encode(result))
+            return result
+
+        async def ainvoke(prompt_value):
+            key = key_for(prompt_value)
+            hit = cache.get(key)
+            if hit is not None:
+                return decode(hit)
+            with track_fallbacks() as fallbacks:
+                result = await runnable.ainvoke(prompt_value)
+            if not fallbacks:
+                cache.put(key, encode(result))
+            return result
 
+        return RunnableLambda(invoke, afunc=ainvoke)
+
+    def _cache_key(self, prompt_value, schema) -> str:
+        model = getattr(self.llm, "model", None) or getattr(self.llm, "model_name", None)
+        temperature = getattr(self.llm, "temperature", None)
+        messages = [(m.type, m.content) for m in prompt_value.to_messages()]
+        return self.llm_cache.make_key(MODEL_PROVIDER, str(model), temperature, messages,
+                                       getattr(schema, "__name__", str(schema)))
+
+    def _generation_chains(self):
         plan_chain = self._chain_structured(TestPlan, SYSTEM_DIRECTIVE, PLAN_INSTRUCTIONS)
         scen_chain = self._chain_structured(List[TestScenario], SYSTEM_DIRECTIVE, SCENARIO_INSTRUCTIONS)  # type: ignore
         case_chain = self._chain_structured(List[TestCase], SYSTEM_DIRECTIVE, CASE_INSTRUCTIONS)  # type: ignore
+        return plan_chain, scen_chain, case_chain
+
+    def generate_all(self, query: Optional[str] = None,
+                     on_case: Optional[Callable[[TestCase], None]] = None) -> GenerationBundle:
+        """Generate plan, scenarios and cases; `on_case` receives each test case as it is generated."""
+        q = query or "Generate QA assets from given requirements"
+        context = self._context_from_query(q)
+
+        plan_chain, scen_chain, case_chain = self._generation_chains()
 
         test_plan: TestPlan = plan_chain.invoke({"context": context})
         scenarios: List[TestScenario] = scen_chain.invoke({"context": context})
-        cases: List[TestCase] = case_chain.invoke({"context": context})
+        if on_case is None:
+            cases: List[TestCase] = case_chain.invoke({"context": context})
+        else:
+            cases = self._stream_structured(List[TestCase], SYSTEM_DIRECTIVE, CASE_INSTRUCTIONS,  # type: ignore
+                                            {"context": context}, on_case)
+
+        return GenerationBundle(test_plan=test_plan, scenarios=scenarios, cases=cases)
+
+    def generate_one_shot(self, query: Optional[str] = None,
+                          on_case: Optional[Callable[[TestCase], None]] = None) -> GenerationBundle:
+        """generate_all in one LLM call that returns plan, scenarios and cases as one JSON document.
+
+        The reply is streamed through the incremental JSON parser (cases reach
+        `on_case` as they close) and validated part by part. A part that is
+        missing or invalid is generated by its own chain as in generate_all,
+        with the same context and prompt prefix.
+        """
+        q = query or "Generate QA assets from given requirements"
+        context = self._context_from_query(q)
+        inputs = {"context": context}
+
+        prompt_value = self._structured_prompt(GenerationBundle, SYSTEM_DIRECTIVE, BUNDLE_INSTRUCTIONS).invoke(inputs)
+        stream = JsonItemStream(CASE_KEYS)
+        cases: List[TestCase] = []
+        for item in self._stream_json(GenerationBundle, prompt_value, stream):
+            try:
+                case = validate_item(item, List[TestCase])
+            except ValidationError:
+                continue
+            cases.append(case)
+            if on_case is not None:
+                on_case(case)
+        try:
+            data = stream.result()
+        except ValueError as e:
+            print(f"One-shot reply is not usable JSON: {e}")
+            data = None
+
+        parts = coerce_bundle_parts(data, cases)
+        missing = [field for field in ("test_plan", "scenarios", "cases") if field not in parts]
+        if missing:
+            print(f"One-shot reply has no valid {', '.join(missing)}; generating separately.")
+            plan_chain, scen_chain, case_chain = self._generation_chains()
+            if "test_plan" in missing:
+                parts["test_plan"] = plan_chain.invoke(inputs)
+            if "scenarios" in missing:
+                parts["scenarios"] = scen_chain.invoke(inputs)
+            if "cases" in missing:
+                if on_case is None:
+                    parts["cases"] = case_chain.invoke(inputs)
+                else:
+                    parts["cases"] = self._stream_structured(List[TestCase], SYSTEM_DIRECTIVE,  # type: ignore
+                                                             CASE_INSTRUCTIONS, inputs, on_case)
+        return GenerationBundle(**parts)
+
+    async def agenerate_all(self, query: Optional[str] = None, max_concurrency: int = 3) -> GenerationBundle:
+        """Same output as generate_all, but the three chains share one context and run concurrently."""
+        q = query or "Generate QA assets from given requirements"
+        context = self._context_from_query(q)
+
+        chains = self._generation_chains()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
 
+        async def run(chain):
+            async with semaphore:
+                return await chain.ainvoke({"context": context})
+
+        if PROMPT_CACHE and MODEL_PROVIDER in PROMPT_CACHE_PROVIDERS:
+            # The first call writes the provider's prompt cache; started together, all three would miss it
+            test_plan = await run(chains[0])
+            scenarios, cases = await asyncio.gather(*(run(chain) for chain in chains[1:]))
+        else:
+            test_plan, scenarios, cases = await asyncio.gather(*(run(chain) for chain in chains))
         return GenerationBundle(test_plan=test_plan, scenarios=scenarios, cases=cases)
+
+    def requirements(self) -> Dict[str, List[Document]]:
+        """Indexed chunks grouped by requirement: one group per Jira issue, or per source
+        document when the index holds no Jira issues."""
+        grouped: Dict[str, List[Document]] = {}
+        for vector_id in self.vs.index_to_docstore_id.values():
+            doc = self.vs.docstore.search(vector_id)
+            if isinstance(doc, Document):
+                grouped.setdefault(document_id(doc), []).append(doc)
+        jira = {rid: chunks for rid, chunks in grouped.items() if chunks[0].metadata.get("jira_key")}
+        result = jira or grouped
+        for chunks in result.values():
+            chunks.sort(key=lambda d: d.metadata.get("chunk_index", 0))
+        return result
+
+    def generate_map_reduce(self, query: Optional[str] = None, max_workers: int = 4,
+                            requirement_ids: Optional[List[str]] = None, k: int = RETRIEVAL_K) -> GenerationBundle:
+        """Generate test cases per requirement in a bounded worker pool, then merge them.
+
+        Each requirement gets its own chunks plus `k` retrieved related chunks
+        as context, so prompt size (and the response) stays bounded no matter
+        how many requirements the index holds. The plan and scenarios still
+        come from the shared `query` context. `requirement_ids` restricts the
+        fan-out, e.g. to the issues a sync changed.
+        """
+        q = query or "Generate QA assets from given requirements"
+        context = self._context_from_query(q)
+
+        plan_chain, scen_chain, _ = self._generation_chains()
+        case_chain = self._chain_structured(List[TestCase], SYSTEM_DIRECTIVE, REQUIREMENT_CASE_INSTRUCTIONS)  # type: ignore
+
+        requirements = self.requirements()
+        if requirement_ids is not None:
+            requirements = {rid: requirements[rid] for rid in requirement_ids if rid in requirements}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+            plan_future = pool.submit(plan_chain.invoke, {"context": context})
+            scen_future = pool.submit(scen_chain.invoke, {"context": context})
+            case_futures = [
+                (rid, pool.submit(self._cases_for_requirement, case_chain, rid, chunks, k))
+                for rid, chunks in requirements.items()
+            ]
+            groups: List[Tuple[str, List[TestCase]]] = []
+            for rid, future in case_futures:
+                try:
+                    groups.append((requirement_label(rid, requirements[rid]), future.result()))
+                except Exception as e:
+                    # One failed requirement should not sink the whole batch
+                    print(f"Case generation failed for {rid}: {e}")
+            test_plan: TestPlan = plan_future.result()
+            scenarios: List[TestScenario] = scen_future.result()
+
+        return GenerationBundle(test_plan=test_plan, scenarios=scenarios, cases=merge_test_cases(groups))
+
+    def _cases_for_requirement(self, case_chain, rid: str, chunks: List[Document], k: int) -> List[TestCase]:
+        own = self.context_assembler.assemble(chunks)
+        title = chunks[0].page_content.split("\n", 1)[0]
+        related = [d for d in self.retrieve(title, k=k) if document_id(d) != rid]
+        context = own.text
+        if related:
+            # Related chunks only get what the requirement's own text leaves of the budget
+            extra = self.context_assembler.assemble(related, own.budget - own.tokens, exclude=chunks)
+            if extra.text:
+                context += "\n\nRelated context:\n" + extra.text
+        return case_chain.invoke({"context": context, "requirement": requirement_label(rid, chunks)})
+
+
+def make_embeddings(embed_cache_dir: Optional[str] = EMBED_CACHE_DIR, batch_size: int = EMBED_BATCH_SIZE,
+                    processes: int = EMBED_PROCESSES, threads: int = EMBED_THREADS):
+    """The embedding engine, behind the shared embedding cache when `embed_cache_dir` is set."""
+    embeddings = EmbeddingEngine(DEFAULT_EMBED_MODEL, batch_size=batch_size, processes=processes, threads=threads)
+    if embed_cache_dir:
+        embeddings = CachedEmbeddings(embeddings, DEFAULT_EMBED_MODEL, embed_cache_dir,
+                                      max_entries=EMBED_CACHE_MAX_ENTRIES)
+    return embeddings
+
+
+def requirement_label(rid: str, chunks: List[Document]) -> str:
+    meta = chunks[0].metadata
+    return meta.get("jira_key") or meta.get("figma_file") or rid
+
+
+def merge_test_cases(groups: List[Tuple[str, List[TestCase]]]) -> List[TestCase]:
+    """Concatenate per-requirement case lists, drop duplicates and renumber ids.
+
+    Two cases are duplicates when their normalized title and steps match; the
+    survivor's traceability collects the requirements of both.
+    """
+    merged: List[TestCase] = []
+    seen: Dict[tuple, TestCase] = {}
+    for label, cases in groups:
+        for case in cases or []:
+            signature = (normalize_text(case.title).lower(),
+                         tuple(normalize_text(step).lower() for step in case.steps))
+            trace = list(case.traceability or []) or [label]
+            if signature in seen:
+                kept = seen[signature]
+                kept.traceability = list(dict.fromkeys((kept.traceability or []) + trace))
+                continue
+            case.traceability = trace
+            seen[signature] = case
+            merged.append(case)
+    for i, case in enumerate(merged, start=1):
+        case.id = f"TC-{i:03d}"
+    return merged
@@ -0,0 +1,72 @@
+"""LLM provider registry. Each provider's SDK is imported only when that provider is used."""
+from typing import Callable, Dict, List, Sequence
+
+from src.config import (
+    MODEL_PROVIDER, LLM_FAILOVER,
+    OPENAI_API_KEY, OPENAI_MODEL,
+    ANTHROPIC_API_KEY, ANTHROPIC_MODEL,
+    GROQ_API_KEY, GROQ_MODEL,
+    COHERE_API_KEY, COHERE_MODEL,
+)
+
+
+def _groq():
+    from src.rag.groq_wrapper import ChatGroq
+    return ChatGroq(api_key=GROQ_API_KEY, model=GROQ_MODEL, temperature=0.2)
+
+
+def _cohere():
+    from langchain_cohere import ChatCohere
+    return ChatCohere(cohere_api_key=COHERE_API_KEY, model=COHERE_MODEL, temperature=0.2)
+
+
+def _openai():
+    from langchain_openai import ChatOpenAI
+    from src.clients.http import http_client
+    return ChatOpenAI(api_key=OPENAI_API_KEY, model=OPENAI_MODEL, temperature=0.2, http_client=http_client())
+
+
+def _anthropic():
+    from langchain_anthropic import ChatAnthropic
+    return ChatAnthropic(api_key=ANTHROPIC_API_KEY, model=ANTHROPIC_MODEL, temperature=0.2)
+
+
+# name -> (API key, factory)
+PROVIDERS: Dict[str, tuple] = {
+    "groq": (GROQ_API_KEY, _groq),
+    "cohere": (COHERE_API_KEY, _cohere),
+    "openai": (OPENAI_API_KEY, _openai),
+    "anthropic": (ANTHROPIC_API_KEY, _anthropic),
+}
+
+
+def register_provider(name: str, api_key: str, factory: Callable[[], object]):
+    PROVIDERS[name] = (api_key, factory)
+
+
+def has_api_key(provider: str) -> bool:
+    """True when `provider` is registered with a real key (not the config placeholder)."""
+    api_key, factory = PROVIDERS.get(provider, (None, None))
+    return factory is not None and bool(api_key) and not api_key.startswith("YOUR_")
+
+
+def make_provider_llm(provider: str = MODEL_PROVIDER):
+    """The bare LangChain chat model of one provider."""
+    if not has_api_key(provider):
+        raise RuntimeError(f"No LLM provider configured for '{provider}'. Set env vars: GROQ_API_KEY, COHERE_API_KEY, OPENAI_API_KEY, or ANTHROPIC_API_KEY.")
+    return PROVIDERS[provider][1]()
+
+
+def failover_providers(provider: str = MODEL_PROVIDER, order: Sequence[str] = LLM_FAILOVER) -> List[str]:
+    return [name for name in order if name != provider and has_api_key(name)]
+
+
+def make_llm(provider: str = MODEL_PROVIDER, failover: Sequence[str] = LLM_FAILOVER):
+    """`provider`'s chat model behind the resilient client (rate limits, retries, circuit
+    breaker); the providers of `failover` that have an API key take over when it fails."""
+    from src.rag.llm_client import ResilientChatModel
+    primary = make_provider_llm(provider)
+    backups = failover_providers(provider, failover)
+    print(f"Using model provider: {provider}" + (f" (failover: {', '.join(backups)})" if backups else ""))
+    return ResilientChatModel.for_providers(primary, provider,
+                                            [(name, lambda name=name: make_provider_llm(name)) for name in backups])
@@ -0,0 +1,85 @@
+"""Semantic cache for vector retrieval results."""
+import json
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class RetrievalCache:
+    """Reuses retrieval results for identical or near-identical queries.
+
+    Entries are bucketed by (index version, k, filters, mode); within a bucket a
+    query hits when the cosine similarity of its embedding to a cached
+    query's embedding reaches `threshold`. Entries of older index versions
+    are dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self, max_entries: int = 256, threshold: float = 0.97):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[object] = None
+        self._entries: "OrderedDict[int, Tuple[tuple, np.ndarray, List[Document]]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bucket(k: int, filters: Optional[dict], mode: str) -> tuple:
+        return (k, json.dumps(filters, sort_keys=True, default=str) if filters else "", mode)
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def get(self, index_version, query_vector: Sequence[float], k: int,
+            filters: Optional[dict] = None, mode: str = "dense") -> Optional[List[Document]]:
+        bucket = self._bucket(k, filters, mode)
+        query = self._normalize(query_vector)
+        with self._lock:
+            self._check_version(index_version)
+            best_id, best_score = None, self.threshold
+            for entry_id, (entry_bucket, vec, _) in self._entries.items():
+                if entry_bucket != bucket:
+                    continue
+                score = float(np.dot(query, vec))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            return list(self._entries[best_id][2])
+
+    def put(self, index_version, query_vector: Sequence[float], k: int,
+            filters: Optional[dict], docs: List[Document], mode: str = "dense"):
+        with self._lock:
+            self._check_version(index_version)
+            self._entries[self._next_id] = (self._bucket(k, filters, mode), self._normalize(query_vector), list(docs))
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def _check_version(self, index_version):
+        if index_version != self._version:
+            self._entries.clear()
+            self._version = index_version
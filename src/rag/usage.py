@@ -0,0 +1,48 @@
+"""Token usage accounting for chat model calls, including provider prompt-cache hits."""
+import threading
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+
+class UsageTracker(BaseCallbackHandler):
+    """Callback that sums the `usage_metadata` of every chat model call it is attached to.
+
+    `cache_read` counts input tokens the provider served from its prompt
+    cache (Anthropic cache reads, OpenAI/Groq cached prompt tokens);
+    `cache_creation` counts tokens written to the Anthropic cache.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_read = 0
+        self.cache_creation = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any):
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if not usage:
+                    continue
+                details = usage.get("input_token_details") or {}
+                with self._lock:
+                    self.calls += 1
+                    self.input_tokens += usage.get("input_tokens", 0)
+                    self.output_tokens += usage.get("output_tokens", 0)
+                    self.cache_read += details.get("cache_read") or 0
+                    self.cache_creation += details.get("cache_creation") or 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cache_read": self.cache_read,
+                "cache_creation": self.cache_creation,
+                "cache_hit_rate": self.cache_read / self.input_tokens if self.input_tokens else 0.0,
+            }
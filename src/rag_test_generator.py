@@ -1,9 +1,11 @@
 import os
 import json
+import asyncio
+import hashlib
 import argparse
 import warnings
 from pathlib import Path
-from typing import List
+from typing import TYPE_CHECKING, List
 
 # Suppress deprecation warnings
 warnings.filterwarnings('ignore', category=UserWarning)
@@ -11,14 +13,27 @@ warnings.filterwarnings('ignore', category=UserWarning)
 from langchain_core.documents import Document
 
 from src.config import (
-    JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN,
-    FIGMA_TOKEN,
+    JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN, JIRA_PAGE_SIZE,
+    SYNC_STATE_DIR, JIRA_SYNC_OVERLAP_MINUTES,
+    FIGMA_TOKEN, FIGMA_MAX_WORKERS, FIGMA_RATE_PER_SEC,
+    INDEX_DIR, INDEX_KIND,
+    EMBED_CACHE_DIR,
+    EMBED_BATCH_SIZE, EMBED_PROCESSES, EMBED_THREADS,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    LLM_CACHE_PATH,
+    RETRIEVAL_MODE, RERANK_MODEL,
+    GENERATION_ONE_SHOT,
 )
+from src.clients.http import connection_stats
 from src.clients.jira_client import JiraClient
+from src.clients.jira_sync import ChangeSet, JiraSync
 from src.clients.figma_client import FigmaClient
-from src.rag.pipeline import RAGTestGenerator
+from src.rag.index_store import jira_document_id
 from src.models.schemas import GenerationBundle
 
+if TYPE_CHECKING:
+    from src.rag.pipeline import RAGTestGenerator
+
 DEMO_DOCS = [
     Document(page_content=(
         "Jira ABC-123: User can sign in with email and password.\n\n"
@@ -33,21 +48,102 @@ DEMO_DOCS = [
 ]
 
 
-def build_docs(jira_jql: str = None, jira_project: str = None, figma_file: str = None) -> List[Document]:
+def make_jira_client() -> JiraClient:
+    if not (JIRA_BASE_URL and JIRA_EMAIL and JIRA_API_TOKEN):
+        raise RuntimeError("Jira env vars missing. Set JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN.")
+    return JiraClient(JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN, page_size=JIRA_PAGE_SIZE)
+
+
+def make_figma_client() -> FigmaClient:
+    if not FIGMA_TOKEN:
+        raise RuntimeError("Figma env var FIGMA_TOKEN missing.")
+    return FigmaClient(FIGMA_TOKEN, max_workers=FIGMA_MAX_WORKERS, rate_per_sec=FIGMA_RATE_PER_SEC)
+
+
+def build_docs(jira_jql: str = None, jira_project: str = None, figma_files: List[str] = None,
+               figma_ids: List[str] = None, figma_depth: int = None,
+               jira_client: JiraClient = None, figma_client: FigmaClient = None) -> List[Document]:
+    """Fetch the Jira issues and Figma files of one run. Passing clients reuses their
+    connection pools and rate limits (batch runs share one of each)."""
     docs: List[Document] = []
     if jira_jql or jira_project:
-        if not (JIRA_BASE_URL and JIRA_EMAIL and JIRA_API_TOKEN):
-            raise RuntimeError("Jira env vars missing. Set JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN.")
-        jc = JiraClient(JIRA_BASE_URL, JIRA_EMAIL, JIRA_API_TOKEN)
-        docs.extend(jc.search(jql=jira_jql, project_key=jira_project))
-    if figma_file:
-        if not FIGMA_TOKEN:
-            raise RuntimeError("Figma env var FIGMA_TOKEN missing.")
-        fc = FigmaClient(FIGMA_TOKEN)
-        docs.extend(fc.fetch_file_documents(figma_file))
+        jc = jira_client or make_jira_client()
+        docs.extend(jc.iter_documents(jql=jira_jql, project_key=jira_project))
+        if jira_client is None:
+            print(f"Jira: {jc.stats.summary()}")
+    if figma_files:
+        fc = figma_client or make_figma_client()
+        docs.extend(fc.fetch_many(figma_files, ids=figma_ids, depth=figma_depth))
     return docs
 
 
+def default_index_name(jira_jql: str = None, jira_project: str = None, figma_files: List[str] = None) -> str:
+    """One persistent index per source selection, so syncs never drop another query's docs."""
+    key = "|".join([jira_jql or "", jira_project or "", ",".join(sorted(figma_files or []))])
+    return "idx-" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+
+
+def change_query(changes: ChangeSet, max_items: int = 20) -> str:
+    """Retrieval query focused on the issues a sync added or changed."""
+    items = [f"{d.metadata.get('jira_key')} {d.metadata.get('summary', '')}".strip()
+             for d in changes.documents[:max_items]]
+    return "Generate QA assets for these updated requirements: " + "; ".join(items)
+
+
+def print_run_summary(rag: "RAGTestGenerator"):
+    print("Run summary:")
+    for label, stats in (("Embedding cache", rag.embedding_cache_stats()),
+                         ("Retrieval cache", rag.retrieval_cache_stats()),
+                         ("LLM cache", rag.llm_cache_stats())):
+        if stats:
+            print(f"  {label}: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+    usage = rag.usage_stats()
+    if usage["calls"]:
+        cached = f", {usage['cache_read']} from prompt cache ({usage['cache_hit_rate']:.0%})" if usage["cache_read"] else ""
+        print(f"  LLM usage: {usage['calls']} calls, {usage['input_tokens']} input tokens{cached}, "
+              f"{usage['output_tokens']} output tokens")
+    client = rag.llm_client_stats()
+    if client and any(s["retries"] or s["failures"] for s in client.values()):
+        print("  LLM providers: " + "; ".join(
+            f"{name} {s['calls']} calls, {s['retries']} retries, {s['failures']} failures, "
+            f"{s['rate_wait_seconds']:.1f}s rate-limited, circuit {s['circuit']}"
+            for name, s in client.items() if s["calls"] or s["failures"]))
+    context = rag.context_stats()
+    if context["calls"]:
+        saved = 1 - context["tokens"] / context["raw_tokens"] if context["raw_tokens"] else 0.0
+        print(f"  Context: {context['chunks_used']}/{context['chunks_in']} chunks, {context['tokens']} tokens "
+              f"({saved:.0%} below raw, budget {context['budget']}), {context['duplicates']} near-duplicates dropped")
+    http = connection_stats()
+    if http["requests"]:
+        http2 = f", {http['http2_requests']} over HTTP/2" if http["http2_requests"] else ""
+        print(f"  HTTP: {http['requests']} requests on {http['connections']} connections "
+              f"({http['reuse_rate']:.0%} reused{http2})")
+    engine = rag.embedding_engine_stats()
+    if engine and engine["docs"]:
+        print(f"  Embedding: {engine['docs']} docs in {engine['seconds']:.1f}s ({engine['docs_per_sec']:.0f} docs/s, "
+              f"batch {engine['batch_size']}, {max(1, engine['processes'])} process(es))")
+
+
+def print_index_report(report: dict):
+    ann, exact = report["ann"], report["exact"]
+    print(f"Index report ({report['kind']}, {report['vectors']} vectors, {report['queries']} queries):")
+    print(f"  recall@{report['k']}: {report['recall']:.3f}")
+    print(f"  latency p50/p95: {ann['p50_ms']:.3f}/{ann['p95_ms']:.3f} ms (exact {exact['p50_ms']:.3f}/{exact['p95_ms']:.3f} ms)")
+    print(f"  size: {report['index_bytes'] / 1e6:.1f} MB (exact {report['exact_bytes'] / 1e6:.1f} MB)")
+
+
+def generate_streaming(rag: "RAGTestGenerator", query: str, out_dir: Path, one_shot: bool = False) -> GenerationBundle:
+    """generate_all (or generate_one_shot) that appends each test case to test_cases.jsonl
+    as soon as it is generated."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    generate = rag.generate_one_shot if one_shot else rag.generate_all
+    with open(out_dir / "test_cases.jsonl", "w", encoding="utf-8") as fh:
+        def write_case(case):
+            fh.write(json.dumps(case.model_dump()) + "\n")
+            fh.flush()
+        return generate(query, on_case=write_case)
+
+
 def write_outputs(bundle: GenerationBundle, out_dir: Path):
     out_dir.mkdir(parents=True, exist_ok=True)
     (out_dir / "test_plan.json").write_text(json.dumps(bundle.test_plan.model_dump(), indent=2), encoding="utf-8")
@@ -119,31 +215,123 @@ def main():
     ap = argparse.ArgumentParser(description="RAG Test Generator")
     ap.add_argument("--jira-jql", type=str, default=None)
     ap.add_argument("--jira-project", type=str, default=None)
-    ap.add_argument("--figma-file", type=str, default=None)
+    ap.add_argument("--figma-file", type=str, action="append", default=None,
+                    help="Figma file key; repeat or comma-separate for several files")
+    ap.add_argument("--figma-ids", type=str, default=None, help="Comma-separated Figma node ids to fetch (pages/frames)")
+    ap.add_argument("--figma-depth", type=int, default=None, help="Limit how deep into the Figma tree to fetch")
     ap.add_argument("--output", type=str, default="out")
     ap.add_argument("--dry-run", action="store_true", help="Retrieve context and show prompts, skip LLM")
     ap.add_argument("--demo", action="store_true", help="Run with built-in sample docs")
+    ap.add_argument("--index-dir", type=str, default=INDEX_DIR, help="Directory of the persistent vector index")
+    ap.add_argument("--index-name", type=str, default=None, help="Index name (default: derived from the query)")
+    ap.add_argument("--index-kind", choices=["auto", "flat", "hnsw", "ivf", "ivfpq"], default=INDEX_KIND,
+                    help="FAISS index type (auto = by corpus size)")
+    ap.add_argument("--index-report", action="store_true",
+                    help="Report recall and query latency of the index against exact search")
+    ap.add_argument("--retrieval", choices=["dense", "hybrid"], default=RETRIEVAL_MODE,
+                    help="dense = FAISS only; hybrid = BM25 + FAISS with reciprocal rank fusion")
+    ap.add_argument("--rerank-model", type=str, default=RERANK_MODEL,
+                    help="Local cross-encoder to rerank retrieved chunks (empty = no rerank)")
+    ap.add_argument("--context-tokens", type=int, default=None,
+                    help="Token budget for retrieved context (default: per provider)")
+    ap.add_argument("--no-persist", action="store_true", help="Build an in-memory index and do not touch disk")
+    ap.add_argument("--embed-cache-dir", type=str, default=EMBED_CACHE_DIR, help="Shared embedding cache directory")
+    ap.add_argument("--no-embed-cache", action="store_true", help="Always recompute embeddings")
+    ap.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE, help="Texts per embedding batch")
+    ap.add_argument("--embed-processes", type=int, default=EMBED_PROCESSES,
+                    help="Embedding worker processes for bulk indexing (0 = in-process)")
+    ap.add_argument("--embed-threads", type=int, default=EMBED_THREADS,
+                    help="Threads per embedding process (0 = automatic)")
+    ap.add_argument("--chunk-tokens", type=int, default=CHUNK_MAX_TOKENS, help="Max tokens per indexed chunk (0 = no chunking)")
+    ap.add_argument("--chunk-overlap", type=int, default=CHUNK_OVERLAP_TOKENS, help="Token overlap between split chunks")
+    ap.add_argument("--one-shot", action="store_true", default=GENERATION_ONE_SHOT,
+                    help="Generate plan, scenarios and cases in a single LLM call")
+    ap.add_argument("--concurrent", action="store_true", help="Run the plan, scenario and case chains in parallel")
+    ap.add_argument("--max-concurrency", type=int, default=3, help="Max LLM calls in flight with --concurrent")
+    ap.add_argument("--map-reduce", action="store_true", help="Generate test cases per requirement and merge them")
+    ap.add_argument("--workers", type=int, default=4, help="Worker pool size for --map-reduce")
+    ap.add_argument("--stream", action="store_true", help="Write test cases to test_cases.jsonl as they are generated")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    ap.add_argument("--sync", action="store_true", help="Only process Jira issues updated since the last sync")
+    ap.add_argument("--state-dir", type=str, default=SYNC_STATE_DIR, help="Where --sync keeps its watermarks")
     args = ap.parse_args()
 
-    if args.demo:
+    figma_files = [k.strip() for arg in args.figma_file or [] for k in arg.split(",") if k.strip()]
+    figma_ids = [i.strip() for i in args.figma_ids.split(",") if i.strip()] if args.figma_ids else None
+    sync = changes = None
+    removed_ids = None
+    query = None
+    if args.sync:
+        if args.demo or args.no_persist or not (args.jira_jql or args.jira_project):
+            raise ValueError("--sync needs --jira-jql or --jira-project and a persistent index.")
+        sync = JiraSync(make_jira_client(), args.state_dir, overlap_minutes=JIRA_SYNC_OVERLAP_MINUTES)
+        changes = sync.fetch_changes(jql=args.jira_jql, project_key=args.jira_project)
+        print(f"Jira sync: {changes.summary()}")
+        docs = changes.documents + build_docs(figma_files=figma_files, figma_ids=figma_ids,
+                                              figma_depth=args.figma_depth)
+        removed_ids = [jira_document_id(key) for key in changes.removed]
+        query = change_query(changes) if changes.documents else None
+    elif args.demo:
         docs = DEMO_DOCS
     else:
-        docs = build_docs(args.jira_jql, args.jira_project, args.figma_file)
+        docs = build_docs(args.jira_jql, args.jira_project, figma_files,
+                          figma_ids=figma_ids, figma_depth=args.figma_depth)
         if not docs:
             raise ValueError("No documents found from Jira/Figma. Check your credentials and query.")
 
-    rag = RAGTestGenerator(docs)
+    # Deferred until after argument parsing: --help should not pay for langchain/FAISS/transformers
+    from src.rag.pipeline import RAGTestGenerator, make_embeddings
+
+    index_name = None
+    if not args.no_persist:
+        index_name = args.index_name or ("demo" if args.demo else
+                                         default_index_name(args.jira_jql, args.jira_project, figma_files))
+    embeddings = make_embeddings(None if args.no_embed_cache else args.embed_cache_dir,
+                                 batch_size=args.embed_batch_size, processes=args.embed_processes,
+                                 threads=args.embed_threads)
+    rag = RAGTestGenerator(docs, index_name=index_name, index_dir=args.index_dir, embeddings=embeddings,
+                           index_kind=args.index_kind, retrieval_mode=args.retrieval, rerank_model=args.rerank_model,
+                           context_tokens=args.context_tokens,
+                           chunk_tokens=args.chunk_tokens, chunk_overlap=args.chunk_overlap,
+                           removed_ids=removed_ids, llm_cache_path=None if args.no_cache else LLM_CACHE_PATH)
+
+    if args.index_report:
+        print_index_report(rag.index_report())
 
     if args.dry_run:
-        ctx = rag._context_from_query("Generate QA assets from given requirements")
+        ctx = rag._context_from_query(query or "Generate QA assets from given requirements")
         print("=== Retrieved Context (dry-run) ===\n")
         print(ctx[:4000])
         print("\nSet --dry-run off to generate outputs.")
+        print_run_summary(rag)
         return
 
-    bundle = rag.generate_all()
+    if changes is not None and not changes.documents:
+        # Removals are already applied to the index; there is nothing new to generate for
+        sync.commit(changes)
+        print("No added or changed Jira issues; skipping generation.")
+        print_run_summary(rag)
+        return
+
+    if args.map_reduce:
+        requirement_ids = None
+        if changes is not None:
+            requirement_ids = [jira_document_id(key) for key in changes.added + changes.changed]
+        bundle = rag.generate_map_reduce(query, max_workers=args.workers, requirement_ids=requirement_ids)
+    elif args.one_shot and not args.stream:
+        bundle = rag.generate_one_shot(query)
+    elif args.concurrent:
+        bundle = asyncio.run(rag.agenerate_all(query, max_concurrency=args.max_concurrency))
+    elif args.stream:
+        bundle = generate_streaming(rag, query, Path(args.output), one_shot=args.one_shot)
+    else:
+        bundle = rag.generate_all(query)
     write_outputs(bundle, Path(args.output))
+    if changes is not None:
+        (Path(args.output) / "changes.json").write_text(json.dumps(changes.to_dict(), indent=2), encoding="utf-8")
+        sync.commit(changes)
     print(f"Wrote outputs to {args.output}")
+    print_run_summary(rag)
 
 if __name__ == "__main__":
     main()
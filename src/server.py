@@ -0,0 +1,340 @@
+"""Long-running HTTP server that keeps the embedder, indexes and LLM client warm.
+
+    python -m src.server --port 8080
+
+Endpoints (JSON request bodies):
+
+    POST /index     {"index": name?, "jira_jql"|"jira_project"|"figma_files"|"demo": ...}
+                    Build or sync a persistent index and keep it resident; with
+                    only "index", load one persisted earlier.
+    POST /retrieve  {"index": name, "query": str, "k": int?, "filters": {}?}
+                    Retrieval only (the dry-run path); no LLM call.
+    POST /generate  {"index": name, "query": str?, "map_reduce": bool?, "one_shot": bool?,
+                     "stream": bool?}
+                    Plan, scenarios and cases ("one_shot": in a single LLM call). With "stream": true the response is
+                    NDJSON: one {"type": "case"} line per test case as it is
+                    generated, then {"type": "bundle"} (or {"type": "error"}).
+    GET  /health    Loaded indexes, queue depth and outbound HTTP connection reuse.
+
+Index and generate requests go through a bounded queue served by a fixed
+number of workers; when the queue is full the server answers 503 with a
+Retry-After header instead of piling up work. Retrieval skips the queue.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+from src.config import (
+    INDEX_DIR,
+    EMBED_CACHE_DIR,
+    LLM_CACHE_PATH, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MAX_ENTRIES,
+    RETRIEVAL_K,
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_QUEUE_SIZE,
+)
+from src.clients.http import connection_stats
+from src.rag.llm_cache import LLMResponseCache
+from src.rag.pipeline import RAGTestGenerator, make_embeddings
+from src.rag.providers import make_llm
+from src.rag_test_generator import DEMO_DOCS, build_docs, default_index_name
+
+MAX_BODY_BYTES = 1 << 20
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ServerState:
+    """Resident resources shared by all requests. Methods are blocking and run on worker threads."""
+
+    def __init__(self, index_dir: str = INDEX_DIR, embed_cache_dir: Optional[str] = EMBED_CACHE_DIR,
+                 llm_cache_path: Optional[str] = LLM_CACHE_PATH):
+        self.index_dir = index_dir
+        self.embeddings = make_embeddings(embed_cache_dir)
+        self.llm_cache = None
+        if llm_cache_path:
+            self.llm_cache = LLMResponseCache(llm_cache_path, ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                                              max_entries=LLM_CACHE_MAX_ENTRIES)
+        self.generators: Dict[str, RAGTestGenerator] = {}
+        self._llm = None
+        self._lock = threading.Lock()
+        self._index_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def llm(self):
+        # Created on the first generate request, so retrieval-only servers need no LLM credentials
+        with self._lock:
+            if self._llm is None:
+                self._llm = make_llm()
+            return self._llm
+
+    def generator(self, name: Optional[str]) -> RAGTestGenerator:
+        if not name:
+            raise HTTPError(400, "Missing 'index'")
+        rag = self.generators.get(name)
+        if rag is None:
+            raise HTTPError(404, f"Unknown index '{name}'; create it with POST /index")
+        return rag
+
+    def update_index(self, body: dict) -> dict:
+        figma_files = body.get("figma_files")
+        if isinstance(figma_files, str):
+            figma_files = [k.strip() for k in figma_files.split(",") if k.strip()]
+        removed_ids = None
+        if body.get("demo"):
+            name, docs = body.get("index") or "demo", DEMO_DOCS
+        elif not (body.get("jira_jql") or body.get("jira_project") or figma_files):
+            # Just load an index persisted earlier: an empty change set leaves it as it is
+            name, docs, removed_ids = body.get("index"), [], []
+            if not name:
+                raise HTTPError(400, "Provide jira_jql, jira_project, figma_files, demo or an existing index")
+            if not (Path(self.index_dir) / name).exists():
+                raise HTTPError(404, f"No persisted index '{name}' in {self.index_dir}")
+        else:
+            name = body.get("index") or default_index_name(body.get("jira_jql"), body.get("jira_project"),
+                                                           figma_files)
+            docs = build_docs(body.get("jira_jql"), body.get("jira_project"), figma_files,
+                              figma_ids=body.get("figma_ids"), figma_depth=body.get("figma_depth"))
+            if not docs:
+                raise HTTPError(400, "No documents found from Jira/Figma")
+        with self._lock:
+            lock = self._index_locks.setdefault(name, threading.Lock())
+        with lock:
+            # Requests already holding the previous generator finish on it; new ones see the update
+            rag = RAGTestGenerator(docs, index_name=name, index_dir=self.index_dir, removed_ids=removed_ids,
+                                   embeddings=self.embeddings,
+                                   llm_cache_path=None, llm_cache=self.llm_cache)
+            self.generators[name] = rag
+        return {"index": name, "documents": len(docs), "chunks": len(rag.vs.index_to_docstore_id),
+                "version": rag.index_version}
+
+    def retrieve(self, body: dict) -> dict:
+        rag = self.generator(body.get("index"))
+        if not body.get("query"):
+            raise HTTPError(400, "Missing 'query'")
+        docs = rag.retrieve(body["query"], k=int(body.get("k") or RETRIEVAL_K), filters=body.get("filters"))
+        return {"index": body["index"], "documents": [
+            {"content": d.page_content, "metadata": d.metadata} for d in docs
+        ]}
+
+    def generate(self, body: dict, on_case: Optional[Callable] = None) -> dict:
+        rag = self.generator(body.get("index"))
+        if rag.llm is None:
+            rag.llm = self.llm
+        if body.get("map_reduce"):
+            bundle = rag.generate_map_reduce(body.get("query"), max_workers=int(body.get("workers") or 4))
+            if on_case:
+                for case in bundle.cases:
+                    on_case(case)
+        elif body.get("one_shot"):
+            bundle = rag.generate_one_shot(body.get("query"), on_case=on_case)
+        else:
+            bundle = rag.generate_all(body.get("query"), on_case=on_case)
+        return bundle.model_dump()
+
+
+class TestGenServer:
+    """Minimal HTTP/1.1 server on asyncio streams with a bounded work queue."""
+
+    def __init__(self, state: ServerState, workers: int = SERVER_WORKERS, queue_size: int = SERVER_QUEUE_SIZE):
+        self.state = state
+        self.workers = max(1, workers)
+        self.queue: "asyncio.Queue[Tuple[Callable[[], Any], asyncio.Future]]" = asyncio.Queue(maxsize=queue_size)
+        # Queue workers plus headroom for retrieval, which bypasses the queue
+        self.pool = ThreadPoolExecutor(max_workers=self.workers + 4)
+        self._tasks = []
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        server = await asyncio.start_server(self._handle, host, port)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"Serving on http://{host}:{port} ({self.workers} workers, queue {self.queue.maxsize})")
+        async with server:
+            await server.serve_forever()
+
+    async def _worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            fn, future = await self.queue.get()
+            try:
+                if not future.cancelled():
+                    future.set_result(await loop.run_in_executor(self.pool, fn))
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    def _enqueue(self, fn: Callable[[], Any]) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((fn, future))
+        except asyncio.QueueFull:
+            raise HTTPError(503, "Server busy, retry later", {"Retry-After": str(5 * self.queue.qsize() // self.workers or 1)})
+        return future
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                try:
+                    await self._dispatch(method, path, body, writer, keep_alive)
+                except HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers)
+                except Exception as e:
+                    await self._send_json(writer, 500, {"error": str(e)}, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except HTTPError as e:
+            await self._send_json(writer, e.status, {"error": str(e)}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        try:
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        length = int(headers.get("content-length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        raw = await reader.readexactly(length) if length else b""
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError as e:
+            raise HTTPError(400, f"Invalid JSON body: {e}")
+        return method.upper(), path.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method: str, path: str, body: dict, writer: asyncio.StreamWriter, keep_alive: bool):
+        loop = asyncio.get_running_loop()
+        if path == "/health":
+            await self._send_json(writer, 200, {
+                "status": "ok",
+                "indexes": sorted(self.state.generators),
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue.maxsize,
+                "http": connection_stats(),
+            }, keep_alive)
+            return
+        if method != "POST":
+            raise HTTPError(405, f"{method} not allowed on {path}")
+        if path == "/retrieve":
+            result = await loop.run_in_executor(self.pool, self.state.retrieve, body)
+            await self._send_json(writer, 200, result, keep_alive)
+        elif path == "/index":
+            result = await self._enqueue(lambda: self.state.update_index(body))
+            await self._send_json(writer, 200, result, keep_alive)
+        elif path == "/generate":
+            if body.get("stream"):
+                await self._stream_generate(body, writer, keep_alive)
+            else:
+                result = await self._enqueue(lambda: self.state.generate(body))
+                await self._send_json(writer, 200, result, keep_alive)
+        else:
+            raise HTTPError(404, f"No route for {path}")
+
+    async def _stream_generate(self, body: dict, writer: asyncio.StreamWriter, keep_alive: bool):
+        loop = asyncio.get_running_loop()
+        events: "asyncio.Queue[dict]" = asyncio.Queue()
+
+        def on_case(case):
+            loop.call_soon_threadsafe(events.put_nowait, {"type": "case", "case": case.model_dump()})
+
+        self.state.generator(body.get("index"))  # fail fast with 404 before committing to a stream
+        future = self._enqueue(lambda: self.state.generate(body, on_case=on_case))
+        await self._send_head(writer, 200, {"Content-Type": "application/x-ndjson",
+                                            "Transfer-Encoding": "chunked"}, keep_alive)
+        while True:
+            getter = asyncio.ensure_future(events.get())
+            await asyncio.wait({getter, future}, return_when=asyncio.FIRST_COMPLETED)
+            if getter.done():
+                await self._send_chunk(writer, getter.result())
+                continue
+            getter.cancel()
+            break
+        while not events.empty():
+            await self._send_chunk(writer, events.get_nowait())
+        try:
+            await self._send_chunk(writer, {"type": "bundle", "bundle": future.result()})
+        except Exception as e:
+            await self._send_chunk(writer, {"type": "error", "error": str(e)})
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def _send_head(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], keep_alive: bool):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Any, keep_alive: bool,
+                         headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload, default=str).encode("utf-8")
+        await self._send_head(writer, status, {"Content-Type": "application/json",
+                                               "Content-Length": str(len(data)), **(headers or {})}, keep_alive)
+        writer.write(data)
+        await writer.drain()
+
+    async def _send_chunk(self, writer: asyncio.StreamWriter, event: dict):
+        data = (json.dumps(event, default=str) + "\n").encode("utf-8")
+        writer.write(f"{len(data):X}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="RAG Test Generator - HTTP server")
+    ap.add_argument("--host", type=str, default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Index/generate requests run at the same time")
+    ap.add_argument("--queue-size", type=int, default=SERVER_QUEUE_SIZE, help="Requests waiting before 503s")
+    ap.add_argument("--index-dir", type=str, default=INDEX_DIR, help="Directory of the persistent vector indexes")
+    ap.add_argument("--embed-cache-dir", type=str, default=EMBED_CACHE_DIR, help="Shared embedding cache directory")
+    ap.add_argument("--no-embed-cache", action="store_true", help="Always recompute embeddings")
+    ap.add_argument("--no-cache", action="store_true", help="Bypass the LLM response cache")
+    ap.add_argument("--preload", type=str, action="append", default=[],
+                    help="Index name to load at startup (repeatable; 'demo' loads the sample docs)")
+    args = ap.parse_args()
+
+    state = ServerState(index_dir=args.index_dir,
+                        embed_cache_dir=None if args.no_embed_cache else args.embed_cache_dir,
+                        llm_cache_path=None if args.no_cache else LLM_CACHE_PATH)
+    for name in args.preload:
+        print(state.update_index({"demo": True} if name == "demo" else {"index": name}))
+    server = TestGenServer(state, workers=args.workers, queue_size=args.queue_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Thread-safe token-bucket rate limiting."""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Allows `rate` units per second on average with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0) -> float:
+        """Block until `amount` units are available; returns the time spent waiting."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return waited
+                delay = (amount - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def refund(self, amount: float):
+        """Return units taken by `acquire` that turned out not to be needed."""
+        if amount <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class HostRateLimiter:
+    """One token bucket per host, created on first use."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, host: str) -> float:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket.acquire()
+
+
+class ConcurrencyGate:
+    """Caps calls in flight at `max_concurrency` and their start rate at `rate_per_min`.
+
+    Used as a context manager around each call (`with gate:` in threads,
+    `async with gate:` in coroutines); one gate per provider is shared by
+    every caller that talks to it.
+    """
+
+    def __init__(self, max_concurrency: int, rate_per_min: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+        self._bucket = TokenBucket(rate_per_min / 60.0, max(1, max_concurrency)) if rate_per_min else None
+
+    def __enter__(self):
+        self._slots.acquire()
+        if self._bucket is not None:
+            self._bucket.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._slots.release()
+
+    async def __aenter__(self):
+        # Waiting blocks, so do it off the event loop
+        await asyncio.to_thread(self.__enter__)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.__exit__(*exc)
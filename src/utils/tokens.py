@@ -0,0 +1,36 @@
+"""Token counting helpers backed by tiktoken."""
+from functools import lru_cache
+from typing import List
+
+import tiktoken
+
+from src.config import TOKENIZER_ENCODING
+
+# Rough chars-per-token ratio used when the BPE file cannot be loaded (offline hosts)
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def get_encoding():
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    enc = get_encoding()
+    if enc is None:
+        return (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, size: int, overlap: int = 0) -> List[str]:
+    """Hard-split text into windows of at most `size` tokens, `overlap` tokens apart."""
+    step = max(size - overlap, 1)
+    enc = get_encoding()
+    if enc is None:
+        size, step = size * _CHARS_PER_TOKEN, step * _CHARS_PER_TOKEN
+        return [text[i:i + size] for i in range(0, max(len(text) - overlap * _CHARS_PER_TOKEN, 1), step)]
+    ids = enc.encode(text, disallowed_special=())
+    return [enc.decode(ids[i:i + size]) for i in range(0, max(len(ids) - overlap, 1), step)]